@@ -0,0 +1,126 @@
+"""Compare the single-pass contact scanner with the old extract_emails/extract_phones.
+
+Run from the repository root: python -m benchmarks.contacts_bench [--kb 512] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+from leadfinder.contacts import contacts_from_document, extract_contacts
+from leadfinder.document import Document
+
+
+# The implementations extract_emails/extract_phones used before leadfinder.contacts.
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(\+?\d[\d\-\s\(\)]{7,}\d)")
+
+
+def old_extract_emails(text):
+    return sorted(set(m.lower() for m in EMAIL_RE.findall(text or "")))
+
+
+def old_extract_phones(text):
+    found = []
+    for m in PHONE_RE.findall(text or ""):
+        digits = re.sub(r"\D", "", m)
+        if 10 <= len(digits) <= 15:
+            found.append("+" + digits if m.strip().startswith("+") else digits)
+    unique = []
+    for p in found:
+        if p not in unique:
+            unique.append(p)
+    return unique
+
+
+# Real-world layouts the synthetic pages do not produce: labels glued to the
+# number, several items on one line, markup around them.
+SAMPLES = [
+    "Tel.+49 30 1234567",
+    "Ph.0123 456 7890",
+    "Mob.9876543210",
+    "Fax-030 1234 5678",
+    "Call5125550100",
+    "Phone: (512) 555-0100 | Email: info@acme-plumbing.com",
+    "<p>Kontakt: office@zahnarzt-berlin.de, Tel. +49 (0)30 98765432</p>",
+    "Mail sales@shop.co.uk or call 020 7946 0958 today",
+    "facebook.com/acmeplumbing tel:+15125550100",
+]
+# Markup whose text nodes sit next to each other: numbers in adjacent cells or
+# list items must not run together once the page is reduced to text.
+HTML_SAMPLES = [
+    "<table><tr><td>(512) 555-0100</td><td>(512) 555-0199</td></tr></table>",
+    "<ul><li>+49 30 1234567</li><li>+49 30 7654321</li></ul>",
+    "<div><span>Office</span><span>020 7946 0958</span></div><div>020 7946 0959</div>",
+    "<dl><dt>Email</dt><dd>info@acme-plumbing.com</dd><dt>Phone</dt><dd>512 555 0100</dd></dl>",
+]
+
+
+def check_samples() -> None:
+    for sample in SAMPLES:
+        contacts = extract_contacts(sample)
+        assert {c.value for c in contacts.emails} == set(old_extract_emails(sample)), sample
+        assert [c.value for c in sorted(contacts.phones, key=lambda c: c.pos)] == old_extract_phones(sample), sample
+    # The old functions ran on the raw markup, where tags keep the nodes apart.
+    for html in HTML_SAMPLES:
+        for parser in ("auto", "html.parser"):
+            contacts = contacts_from_document(Document(html, parser=parser))
+            assert {c.value for c in contacts.emails} == set(old_extract_emails(html)), (parser, html)
+            assert [c.value for c in sorted(contacts.phones, key=lambda c: c.pos)] == old_extract_phones(html), (parser, html)
+
+
+def make_page(kb: int, phone_share: float = 0.08, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = "lorem ipsum dolor sit amet plumbing repair service call today free quote".split()
+    parts = []
+    size = 0
+    while size < kb * 1024:
+        roll = rng.random()
+        if roll < phone_share:
+            part = f"+1 ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}"
+        elif roll < phone_share + 0.04:
+            part = f"{rng.choice(words)}{rng.randint(1, 500)}@example{rng.randint(1, 50)}.com"
+        elif roll < phone_share + 0.05:
+            part = f"https://www.facebook.com/shop{rng.randint(1, 99)}"
+        else:
+            part = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        parts.append(part)
+        size += len(part) + 1
+    return "\n".join(parts)
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kb", type=int, action="append", help="page size in KiB (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check_samples()
+
+    # "text" is an ordinary page; "listing" is a directory page that is mostly phone numbers.
+    for profile, phone_share in (("text", 0.08), ("listing", 0.6)):
+        for kb in args.kb or [16, 128, 512]:
+            page = make_page(kb, phone_share)
+            old = timeit(lambda: (old_extract_emails(page), old_extract_phones(page)), args.repeat)
+            new = timeit(lambda: extract_contacts(page), args.repeat)
+            contacts = extract_contacts(page)
+            assert {c.value for c in contacts.emails} == set(old_extract_emails(page))
+            assert {c.value for c in contacts.phones} == set(old_extract_phones(page))
+            print(
+                f"{profile:<8}{kb:>5} KiB  old {old * 1000:8.1f} ms  new {new * 1000:8.1f} ms  "
+                f"x{old / new:5.1f}  ({len(contacts.emails)} emails, {len(contacts.phones)} phones, "
+                f"{len(contacts.socials)} socials)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Measure what the /leads filter indexes and the search index cost on bulk upserts.
+
+Run from the repository root: python -m benchmarks.upsert_bench [--leads 50000] [--batch 500]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from leadfinder.db import LEAD_INDEXES, LeadStore
+from leadfinder.models import Lead
+
+
+CITIES = ["Berlin", "Hamburg", "Munich", "Cologne", "Austin", "Denver", "Leeds", "Lyon"]
+SOURCES = ["osm_overpass", "google_places", "google_maps_browser", "directory", "website_seed"]
+CATEGORIES = ["amenity=dentist", "craft=plumber", "shop=bakery", "office=lawyer", "amenity=restaurant"]
+
+
+def make_leads(count: int, seed: int = 7) -> list[Lead]:
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    leads = []
+    for i in range(count):
+        leads.append(
+            Lead(
+                name=f"{rng.choice(['Acme', 'Smile', 'Best', 'City'])} {rng.choice(['Dental', 'Plumbing', 'Bakery', 'Law'])} {i}",
+                email=f"info{i}@example{i % 97}.com" if rng.random() < 0.4 else None,
+                phone=f"+1512555{i % 10000:04d}" if rng.random() < 0.7 else None,
+                website=f"https://shop{i}.example.org/",
+                city=rng.choice(CITIES),
+                source=rng.choice(SOURCES),
+                category=rng.choice(CATEGORIES),
+                created_at=start + timedelta(seconds=i),
+            )
+        )
+    return leads
+
+
+def with_contacts(leads: list[Lead]) -> list[Lead]:
+    # The same keys found again with contacts filled in: the update path.
+    return [
+        Lead(**{**lead.__dict__, "email": lead.email or f"office@{lead.name.split()[-1]}.example.net", "phone": lead.phone or "+15125550100"})
+        for lead in leads
+    ]
+
+
+def strip_schema(store: LeadStore, keep_filters: bool, keep_fts: bool) -> None:
+    def strip(con):
+        if not keep_filters:
+            for index in LEAD_INDEXES.values():
+                con.execute(f"DROP INDEX IF EXISTS {index}")
+        if not keep_fts:
+            for trigger in ("leads_fts_insert", "leads_fts_delete", "leads_fts_update"):
+                con.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            con.execute("DROP TABLE IF EXISTS leads_fts")
+
+    store._write(strip)
+
+
+def run(leads: list[Lead], updates: list[Lead], batch: int, keep_filters: bool, keep_fts: bool) -> tuple[float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        with LeadStore(os.path.join(tmp, "leads.db")) as store:
+            store.init_db()
+            strip_schema(store, keep_filters, keep_fts)
+            timings = []
+            for rows in (leads, updates):
+                start = time.perf_counter()
+                for i in range(0, len(rows), batch):
+                    store.upsert_many(rows[i : i + batch])
+                timings.append(time.perf_counter() - start)
+    return timings[0], timings[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--leads", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=500, help="leads per upsert_many call (app.db_batch_size)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    leads = make_leads(args.leads)
+    updates = with_contacts(leads)
+    print(f"{len(LEAD_INDEXES)} filter indexes, {args.leads} leads, batches of {args.batch}")
+    base = None
+    for label, keep_filters, keep_fts in (
+        ("unique index only", False, False),
+        ("+ filter indexes", True, False),
+        ("+ search index", True, True),
+    ):
+        best = [float("inf"), float("inf")]
+        for _ in range(args.repeat):
+            timings = run(leads, updates, args.batch, keep_filters, keep_fts)
+            best = [min(b, t) for b, t in zip(best, timings)]
+        insert_rate, update_rate = (args.leads / t for t in best)
+        base = base or (insert_rate, update_rate)
+        print(
+            f"{label:<20} insert {insert_rate:>9,.0f} leads/s (x{base[0] / insert_rate:4.2f})  "
+            f"update {update_rate:>9,.0f} leads/s (x{base[1] / update_rate:4.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import uuid
+from collections import deque
+from copy import deepcopy
+
+
+# Config keys never written to the runs table; a resumed run takes them from
+# the current config (and environment) instead.
+SECRET_SUFFIXES = ("api_key", "token", "secret", "password")
+
+
+def _is_secret(key) -> bool:
+    return isinstance(key, str) and key.lower().endswith(SECRET_SUFFIXES)
+
+
+def redact_config(cfg: dict) -> dict:
+    out = {}
+    for key, value in cfg.items():
+        if _is_secret(key):
+            continue
+        out[key] = redact_config(value) if isinstance(value, dict) else deepcopy(value)
+    return out
+
+
+def restore_secrets(stored: dict, current: dict) -> dict:
+    for key, value in (current or {}).items():
+        if _is_secret(key):
+            stored[key] = value
+        elif isinstance(value, dict) and isinstance(stored.get(key), dict):
+            restore_secrets(stored[key], value)
+    return stored
+
+
+def add_stats(previous: dict, current: dict) -> dict:
+    # Run totals across resumes: counters add up, per-source fetch counts add
+    # up and keep the latest error, everything else is the latest value.
+    total = dict(current)
+    for key, value in (previous or {}).items():
+        if key not in current:
+            total[key] = value
+        elif key == "sources":
+            sources = {name: dict(src) for name, src in value.items()}
+            for name, src in current["sources"].items():
+                fetched = sources.get(name, {}).get("fetched", 0) + src.get("fetched", 0)
+                sources[name] = {**src, "fetched": fetched}
+            total["sources"] = sources
+        elif isinstance(value, int) and not isinstance(value, bool):
+            total[key] = value + current[key]
+    return total
+
+
+class SourceIncomplete(Exception):
+    # Raised by a source once it has yielded everything it could, when some of
+    # its work (tiles, cities) failed and was skipped. The source is not marked
+    # done and the run ends "partial", so resuming it retries the skipped work.
+    def __init__(self, message: str, skipped: list | None = None):
+        super().__init__(message)
+        self.skipped = list(skipped or [])
+
+
+class SourceCheckpoint:
+    # Passed to a source as `checkpoint=`. `cursor` is where a resumed run left
+    # off ({} on a fresh run). `save()` records that everything the source has
+    # yielded so far is behind the new cursor.
+    def __init__(self, name: str, cursor: dict | None, emit):
+        self.name = name
+        self.cursor = dict(cursor or {})
+        self._emit = emit
+
+    def get(self, key: str, default=None):
+        return self.cursor.get(key, default)
+
+    def save(self, **cursor) -> None:
+        self.cursor = cursor
+        self._emit(self.name, dict(cursor))
+
+
+class RunCheckpoint:
+    # Source cursors arrive tagged with the number of leads the pipeline had
+    # pulled at that point, and are only written once every one of those leads
+    # has been stored, so a resumed run never skips a lead that was in flight.
+    def __init__(self, store, run_id: str, cfg: dict, cursors: dict | None = None, stats: dict | None = None):
+        self.store = store
+        self.run_id = run_id
+        self.cfg = cfg
+        self.cursors = dict(cursors or {})
+        self.previous_stats = dict(stats or {})
+        self._marks = deque()
+
+    @classmethod
+    def start(cls, store, cfg: dict) -> "RunCheckpoint":
+        run_id = uuid.uuid4().hex[:12]
+        store.create_run(run_id, redact_config(cfg))
+        return cls(store, run_id, cfg)
+
+    @classmethod
+    def resume(cls, store, run_id: str, current_cfg: dict | None = None, force: bool = False) -> "RunCheckpoint":
+        # The run continues with the config it started with; secrets come
+        # from `current_cfg`, as they were never stored. A run marked running
+        # is refused so two processes never work from the same cursors;
+        # `force` takes over one whose process was killed before it could
+        # record how it ended.
+        run = store.load_run(run_id)
+        if run is None:
+            raise ValueError(f"Unknown run id: {run_id}")
+        if run["status"] == "completed":
+            raise ValueError(f"Run {run_id} already completed.")
+        if not store.claim_run(run_id, force=force):
+            raise ValueError(
+                f"Run {run_id} is already running. If the process running it was killed, resume it with --force."
+            )
+        cfg = restore_secrets(run["config"], current_cfg or {})
+        return cls(store, run_id, cfg, run["cursors"], run["stats"])
+
+    def source(self, name: str, emit) -> SourceCheckpoint:
+        return SourceCheckpoint(name, self.cursors.get(name), emit)
+
+    def is_done(self, name: str) -> bool:
+        return bool((self.cursors.get(name) or {}).get("done"))
+
+    def mark(self, seq: int, name: str, cursor: dict) -> None:
+        self._marks.append((seq, name, cursor))
+
+    def pending(self) -> bool:
+        return bool(self._marks)
+
+    def commit(self, processed: int, status: str | None = None, stats: dict | None = None) -> None:
+        # `stats` covers this part of the run; the stored stats are the total.
+        if stats is not None:
+            stats = add_stats(self.previous_stats, stats)
+        ready = {}
+        while self._marks and self._marks[0][0] <= processed:
+            _, name, cursor = self._marks.popleft()
+            ready[name] = cursor
+        if ready or status:
+            self.cursors.update(ready)
+            self.store.save_checkpoints(self.run_id, ready, status=status, stats=stats)
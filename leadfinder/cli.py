@@ -2,7 +2,8 @@ import argparse
 import sys
 
 from .config import load_config
-from .db import LeadStore
+from .db import LeadFilters, LeadStore
+from .export import COMPRESSIONS, FORMATS, write_export
 from .pipeline import run_pipeline
 
 
@@ -18,10 +19,32 @@ def build_parser() -> argparse.ArgumentParser:
     p_run.add_argument("--export", default="", help="Export CSV path (overrides config)")
     p_run.add_argument("--no-enrich", action="store_true", help="Disable website enrichment")
     p_run.add_argument("--dry-run", action="store_true", help="Do not write to DB")
-
-    p_export = sub.add_parser("export", help="Export leads from DB to CSV")
+    p_run.add_argument(
+        "--overpass-cache",
+        choices=["use", "refresh", "bypass"],
+        default=None,
+        help="Overpass response cache: use (default), refresh (refetch and overwrite) or bypass",
+    )
+    p_run.add_argument("--resume", default=None, metavar="RUN_ID", help="Continue an interrupted run from its checkpoints")
+    p_run.add_argument("--force", action="store_true", help="With --resume, take over a run still marked running")
+
+    p_export = sub.add_parser("export", help="Export leads from DB to CSV, JSON Lines or Parquet")
     p_export.add_argument("--config", default="config.yaml")
-    p_export.add_argument("--out", required=True, help="CSV output path")
+    p_export.add_argument("--out", required=True, help="Output path")
+    p_export.add_argument("--format", choices=FORMATS, default="csv")
+    p_export.add_argument("--compression", choices=COMPRESSIONS, default=None)
+    p_export.add_argument("--city", default=None)
+    p_export.add_argument("--source", default=None)
+    p_export.add_argument("--category", default=None)
+    p_export.add_argument("--has-email", choices=["true", "false"], default=None)
+    p_export.add_argument("--has-phone", choices=["true", "false"], default=None)
+    p_export.add_argument("--since", default=None, help="Only leads created at or after this ISO date/time")
+    p_export.add_argument("--until", default=None, help="Only leads created before this ISO date/time")
+
+    p_search = sub.add_parser("search", help="Full-text search leads by name, category or city")
+    p_search.add_argument("query", help="Words to match; each word also matches by its stem and as a prefix")
+    p_search.add_argument("--config", default="config.yaml")
+    p_search.add_argument("--limit", type=int, default=20)
 
     p_cfg = sub.add_parser("print-config", help="Print merged config")
     p_cfg.add_argument("--config", default="config.yaml")
@@ -36,29 +59,76 @@ def main() -> None:
     cfg = load_config(args.config)
 
     if args.command == "init-db":
-        store = LeadStore(cfg["app"]["db_path"])
-        store.init_db()
+        with LeadStore.from_config(cfg) as store:
+            store.init_db()
         print(f"Initialized DB at {cfg['app']['db_path']}")
         return
 
     if args.command == "run":
+        overrides = {}
         if args.no_enrich:
-            cfg["enrichment"]["fetch_website_for_email"] = False
+            overrides["enrichment"] = {"fetch_website_for_email": False}
+        if args.overpass_cache:
+            overrides["sources"] = {"osm_overpass": {"cache": {"mode": args.overpass_cache}}}
         export_path = args.export or ""
-        stats = run_pipeline(cfg, export_path=export_path or None, dry_run=args.dry_run)
+        stats = run_pipeline(
+            cfg,
+            export_path=export_path or None,
+            dry_run=args.dry_run,
+            resume=args.resume,
+            force_resume=args.force,
+            overrides=overrides,
+        )
         print("Run complete:")
+        if stats.get("run_id"):
+            print(f"  Run id:  {stats['run_id']}")
         print(f"  Fetched: {stats['fetched']}")
+        print(f"  Merged:  {stats['merged']}")
         print(f"  Kept:    {stats['kept']}")
         print(f"  Saved:   {stats['saved']}")
+        print(f"  Skipped: {stats['enrich_skipped']} enrichments, {stats['upsert_skipped']} unchanged writes")
+        if stats.get("enrich_failed"):
+            print(f"  Failed:  {stats['enrich_failed']} enrichments")
+        for name, src in stats.get("sources", {}).items():
+            line = f"  {name}: {src['fetched']} fetched"
+            if src.get("skipped"):
+                line += f" (incomplete: {src['error']})"
+            elif src.get("error"):
+                line += f" (failed: {src['error']})"
+            print(line)
         if stats.get("exported_to"):
             print(f"  Export:  {stats['exported_to']}")
         return
 
     if args.command == "export":
-        store = LeadStore(cfg["app"]["db_path"])
-        store.init_db()
-        store.export_csv(args.out)
-        print(f"Exported CSV to {args.out}")
+        try:
+            filters = LeadFilters.from_params(vars(args))
+            with LeadStore.from_config(cfg) as store:
+                store.init_db()
+                write_export(
+                    store,
+                    args.out,
+                    args.format,
+                    filters,
+                    args.compression,
+                    int(cfg["app"].get("export_chunk_size", 5000)),
+                )
+        except (ValueError, RuntimeError) as exc:
+            parser.error(str(exc))
+        print(f"Exported {args.format} to {args.out}")
+        return
+
+    if args.command == "search":
+        try:
+            with LeadStore.from_config(cfg) as store:
+                store.init_db()
+                leads = store.search(args.query, limit=args.limit)
+        except (ValueError, RuntimeError) as exc:
+            parser.error(str(exc))
+        for lead in leads:
+            contact = ", ".join(v for v in (lead["email"], lead["phone"], lead["website"]) if v)
+            print(f"{lead['score']:7.2f}  {lead['name']} | {lead['category']} | {lead['city']} | {contact}")
+        print(f"{len(leads)} result(s)")
         return
 
     if args.command == "print-config":
@@ -0,0 +1,36 @@
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostLimiter:
+    def __init__(self, per_host: int):
+        self.per_host = max(1, int(per_host))
+        self._lock = threading.Lock()
+        self._sems: dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._sems[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str):
+        sem = self._semaphore(url)
+        with sem:
+            yield
+
+
+def put_until_stopped(out: queue.Queue, item, stop: threading.Event, poll_s: float = 0.2) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=poll_s)
+            return True
+        except queue.Full:
+            continue
+    return False
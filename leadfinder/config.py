@@ -1,8 +1,16 @@
 from copy import deepcopy
 from pathlib import Path
 import os
+import stat
+import tempfile
+import threading
 import yaml
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 DEFAULT_CONFIG = {
     "app": {
@@ -14,6 +22,35 @@ DEFAULT_CONFIG = {
         "request_timeout_s": 20,
         "request_delay_s": 0.2,
         "cache_dir": "data/cache",
+        "skip_known": True,
+        "checkpoints": True,
+        "checkpoint_interval_s": 5,
+        "progress_interval_s": 0.5,
+        "max_jobs": 2,
+        "job_history": 100,
+        "html_parser": "auto",
+        "db_batch_size": 500,
+        "export_chunk_size": 5000,
+        "source_queue_size": 256,
+        "http": {
+            "pool_connections": 32,
+            "pool_maxsize": 16,
+            "connect_timeout_s": 10,
+            "max_retries": 0,
+        },
+        "http_cache": {
+            "enabled": True,
+            "ttl_s": 604800,
+            "negative_ttl_s": 86400,
+            "max_mb": 256,
+        },
+        "sqlite": {
+            "journal_mode": "wal",
+            "synchronous": "normal",
+            "cache_size_kb": 16384,
+            "busy_timeout_ms": 5000,
+            "max_write_batch": 64,
+        },
     },
     "sources": {
         "osm_overpass": {
@@ -26,7 +63,21 @@ DEFAULT_CONFIG = {
             "bboxes": [],
             "max_results": 200,
             "overpass_timeout_s": 25,
+            "max_tile_deg": 0.25,
+            "min_tile_deg": 0.01,
+            "max_elements_per_tile": 5000,
+            "tile_workers": 2,
+            "max_tiles_per_query": 16,
+            "rate_limit_retries": 3,
+            "rate_limit_backoff_s": 10,
+            "cache": {
+                "mode": "use",
+                "ttl_s": 86400,
+                "max_mb": 512,
+            },
             "geocode_delay_s": 1.1,
+            "geocode_ttl_s": 2592000,
+            "geocode_negative_ttl_s": 86400,
             "debug": False,
         },
         "google_places": {
@@ -36,6 +87,10 @@ DEFAULT_CONFIG = {
             "cities": ["Austin, TX"],
             "max_results": 60,
             "fetch_details": True,
+            "details_workers": 8,
+            "details_cache_ttl_s": 2592000,
+            "qps": 10,
+            "qps_burst": 5,
         },
         "google_maps_browser": {
             "enabled": False,
@@ -46,6 +101,10 @@ DEFAULT_CONFIG = {
             "slow_mo_ms": 0,
             "wait_after_search_ms": 2000,
             "result_click_delay_s": 0.8,
+            "contexts": 3,
+            "block_resources": True,
+            "event_driven_waits": True,
+            "details_timeout_ms": 5000,
         },
         "directories": {
             "enabled": False,
@@ -63,9 +122,20 @@ DEFAULT_CONFIG = {
         "startup_keywords": ["startup", "saas", "venture", "accelerator", "incubator"],
         "website_policy": "exclude_missing",
     },
+    "dedupe": {
+        "enabled": True,
+        "match_on": ["domain", "phone", "name"],
+        "name_similarity": 0.85,
+        "same_city": True,
+        "phone_conflict_blocks": True,
+        "prefer_sources": [],
+        "max_block_size": 64,
+    },
     "enrichment": {
         "fetch_website_for_email": True,
         "max_pages_per_site": 1,
+        "concurrency": 16,
+        "per_host_concurrency": 2,
         "allowed_email_domains": [],
     },
 }
@@ -80,6 +150,43 @@ def deep_merge(base: dict, override: dict) -> dict:
     return base
 
 
+_config_write_lock = threading.Lock()
+
+
+def update_config_file(path: str, update) -> None:
+    # Read-modify-write of a YAML config under a thread lock and, where
+    # available, an advisory lock on `<path>.lock` shared with other
+    # processes. The new file is written next to the old one and swapped in
+    # with os.replace, so readers see either the old or the new config.
+    p = Path(path)
+    with _config_write_lock:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{p}.lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            data = {}
+            if p.exists():
+                try:
+                    data = yaml.safe_load(p.read_text(encoding="utf-8")) or {}
+                except Exception:
+                    data = {}
+            update(data)
+            fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=f".{p.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(yaml.safe_dump(data, sort_keys=False))
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file as 0600; keep the mode the config had.
+                if p.exists():
+                    os.chmod(tmp, stat.S_IMODE(os.stat(p).st_mode))
+                os.replace(tmp, p)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+
+
 def load_config(path: str) -> dict:
     cfg = deepcopy(DEFAULT_CONFIG)
     p = Path(path)
@@ -0,0 +1,229 @@
+import re
+from dataclasses import dataclass, field
+from urllib.parse import unquote, urlparse
+
+
+SOCIAL_DOMAINS = {
+    "facebook": "facebook",
+    "fb": "facebook",
+    "instagram": "instagram",
+    "twitter": "twitter",
+    "x": "twitter",
+    "linkedin": "linkedin",
+    "youtube": "youtube",
+    "tiktok": "tiktok",
+}
+SOCIAL_RESERVED = {
+    "share", "sharer", "sharer.php", "intent", "home", "login", "hashtag", "plugins",
+    "dialog", "watch", "embed", "search", "p", "tr", "events", "groups", "pages", "profile.php",
+}
+ROLE_MAILBOXES = {"info", "contact", "hello", "office", "sales", "enquiries", "inquiries", "booking", "bookings", "admin"}
+NOREPLY_MAILBOXES = {"noreply", "no-reply", "donotreply", "do-not-reply", "webmaster", "postmaster", "abuse", "privacy"}
+# `logo@2x.png`-style asset names look like addresses.
+ASSET_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif")
+
+# Emails and phones are plain character-class patterns, which the regex
+# engine skips through quickly; a leftmost match of either starts at the
+# beginning of a token unless it directly follows an earlier match.
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"\+?\d[\d\-\s\(\)]{7,}\d")
+# Social links need the token-start lookbehind ("box.com/" is not x.com), which
+# is slow to try at every position, so they are only matched around ".com/".
+SOCIAL_RE = re.compile(
+    r"(?<![A-Za-z0-9._%+-])(?:https?://)?(?:www\.|m\.)?"
+    r"(?P<network>facebook|fb|instagram|twitter|x|linkedin|youtube|tiktok)\.com/"
+    r"(?:company/|in/|channel/|c/|user/)?@?(?P<handle>[A-Za-z0-9_.\-]{2,})"
+)
+SOCIAL_ANCHOR = ".com/"
+# Longest text before and after the anchor up to a two-character handle.
+SOCIAL_BEFORE = len("https://www.instagram")
+SOCIAL_AFTER = len(".com/channel/@") + 2
+TOKEN_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+NUMBER_START = frozenset("+0123456789")
+NON_DIGIT_RE = re.compile(r"\D")
+
+
+@dataclass
+class Contact:
+    kind: str
+    value: str
+    pos: int
+    origin: str = "text"
+    count: int = 1
+    score: int = 0
+
+
+@dataclass
+class Contacts:
+    emails: list[Contact] = field(default_factory=list)
+    phones: list[Contact] = field(default_factory=list)
+    socials: list[Contact] = field(default_factory=list)
+
+    @property
+    def email(self) -> str | None:
+        return self.emails[0].value if self.emails else None
+
+    @property
+    def phone(self) -> str | None:
+        return self.phones[0].value if self.phones else None
+
+
+def normalize_phone(raw: str) -> str:
+    digits = NON_DIGIT_RE.sub("", raw)
+    if not 10 <= len(digits) <= 15:
+        return ""
+    return "+" + digits if raw.lstrip().startswith("+") else digits
+
+
+def _social(m) -> str:
+    handle = m.group("handle").rstrip(".-")
+    if handle.lower() in SOCIAL_RESERVED:
+        return ""
+    return f"{SOCIAL_DOMAINS[m.group('network')]}:{handle}"
+
+
+def _host(url: str) -> str:
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _score_email(c: Contact, site: str) -> int:
+    local, _, domain = c.value.partition("@")
+    score = min(c.count - 1, 2)
+    if c.origin == "mailto":
+        score += 4
+    if site and (domain == site or domain.endswith("." + site) or site.endswith("." + domain)):
+        score += 3
+    if local in ROLE_MAILBOXES:
+        score += 1
+    if local in NOREPLY_MAILBOXES:
+        score -= 4
+    return score
+
+
+def _score_phone(c: Contact) -> int:
+    score = min(c.count - 1, 2)
+    if c.origin == "tel":
+        score += 4
+    if c.value.startswith("+"):
+        score += 1
+    return score
+
+
+class _Collector:
+    def __init__(self):
+        self.found: dict[tuple[str, str], Contact] = {}
+
+    def add(self, kind: str, value: str, pos: int, origin: str) -> None:
+        if not value:
+            return
+        key = (kind, value.lower() if kind == "social" else value)
+        c = self.found.get(key)
+        if c is None:
+            self.found[key] = Contact(kind, value, pos, origin)
+            return
+        c.count += 1
+        if origin != "text":
+            c.origin = origin
+
+
+def _token_start(text: str, i: int) -> bool:
+    # A match may start at the beginning of a token, or where a number is
+    # glued to a label ("Tel.+49 ...", "Call5125550100").
+    if i == 0 or text[i - 1] not in TOKEN_CHARS:
+        return True
+    return text[i - 1] not in NUMBER_START and text[i] in NUMBER_START
+
+
+def _search(pattern: re.Pattern, text: str, pos: int):
+    m = pattern.search(text, pos)
+    # A leftmost match can only start mid-token right where the previous
+    # match ended.
+    while m and not _token_start(text, m.start()):
+        m = pattern.search(text, m.start() + 1)
+    return m
+
+
+def _search_social(text: str, pos: int):
+    anchor = text.find(SOCIAL_ANCHOR, pos)
+    while anchor != -1:
+        m = SOCIAL_RE.search(text, max(pos, anchor - SOCIAL_BEFORE), anchor + SOCIAL_AFTER)
+        if m:
+            return SOCIAL_RE.match(text, m.start())
+        anchor = text.find(SOCIAL_ANCHOR, anchor + 1)
+    return None
+
+
+def _scan_text(text: str, collect: _Collector) -> None:
+    if not text:
+        return
+    # Page order, no overlaps: the next match is the leftmost of the next
+    # email, phone and social link after the previous one, and at the same
+    # position an email wins over a phone, a phone over a social link. A kind
+    # whose next match overlaps the previous one is searched again after it.
+    searches = [
+        (lambda pos: _search(EMAIL_RE, text, pos)) if "@" in text else (lambda pos: None),
+        lambda pos: _search(PHONE_RE, text, pos),
+        lambda pos: _search_social(text, pos),
+    ]
+    ahead = [search(0) for search in searches]
+    end = 0
+    while True:
+        m = kind = None
+        for k in range(3):
+            nxt = ahead[k]
+            if nxt is not None and nxt.start() < end:
+                nxt = ahead[k] = searches[k](end)
+            if nxt is not None and (m is None or nxt.start() < m.start()):
+                m, kind = nxt, k
+        if m is None:
+            return
+        start, end = m.span()
+        if kind == 0:
+            email = m.group().lower()
+            if not email.endswith(ASSET_SUFFIXES):
+                collect.add("email", email, start, "text")
+        elif kind == 1:
+            collect.add("phone", normalize_phone(m.group()), start, "text")
+        else:
+            collect.add("social", _social(m), start, "text")
+
+
+def extract_contacts(text: str, links=(), site_url: str = "") -> Contacts:
+    collect = _Collector()
+    _scan_text(text, collect)
+    base = len(text or "")
+    for i, href in enumerate(links):
+        pos = base + i
+        lower = href[:7].lower()
+        if lower == "mailto:":
+            m = EMAIL_RE.search(href)
+            if m:
+                collect.add("email", m.group(0).lower(), pos, "mailto")
+        elif lower.startswith("tel:"):
+            collect.add("phone", normalize_phone(href[4:]), pos, "tel")
+        else:
+            m = SOCIAL_RE.match(href)
+            if m:
+                collect.add("social", _social(m), pos, "link")
+
+    site = _host(site_url) if site_url else ""
+    out = Contacts()
+    for c in collect.found.values():
+        if c.kind == "email":
+            c.score = _score_email(c, site)
+            out.emails.append(c)
+        elif c.kind == "phone":
+            c.score = _score_phone(c)
+            out.phones.append(c)
+        else:
+            c.score = min(c.count - 1, 2)
+            out.socials.append(c)
+    for items in (out.emails, out.phones, out.socials):
+        items.sort(key=lambda c: (-c.score, c.pos))
+    return out
+
+
+def contacts_from_document(doc) -> Contacts:
+    links = [unquote(href) if href[:7].lower() == "mailto:" else href for href, _ in doc.links]
+    return extract_contacts(doc.text, links, doc.url)
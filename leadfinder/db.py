@@ -1,68 +1,692 @@
+import base64
+import hashlib
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, fields
 from datetime import datetime
+from itertools import combinations, product
 
 from .models import Lead
-from .utils import ensure_parent_dir, write_csv
+from .utils import ensure_parent_dir, write_csv_rows
+
+
+JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+SYNCHRONOUS_MODES = {"off", "normal", "full", "extra"}
+
+UPSERT_SQL = '''
+    INSERT INTO leads (name, email, phone, website, city, source, category, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name, city, website) DO UPDATE SET
+        email = CASE WHEN excluded.email != '' THEN excluded.email ELSE leads.email END,
+        phone = CASE WHEN excluded.phone != '' THEN excluded.phone ELSE leads.phone END,
+        source = CASE WHEN excluded.source != '' THEN excluded.source ELSE leads.source END,
+        category = CASE WHEN excluded.category != '' THEN excluded.category ELSE leads.category END
+'''
+
+
+# Columns the upsert overwrites when the incoming value is non-empty.
+MERGED_COLUMNS = ("email", "phone", "source", "category")
+
+LEAD_COLUMNS = ("id", "name", "email", "phone", "website", "city", "source", "category", "created_at")
+FILTER_COLUMNS = ("city", "source", "category")
+CONTACT_COLUMNS = ("email", "phone")
+# Every combination of equality filters gets one index on those columns,
+# then on whether each contact column is set, then the (created_at, id) page
+# order. A page reads one index range per contact state the filters allow
+# (one to four), merged in page order, so its cost does not grow with the
+# table. Every index is paid for on each lead write, so there is no second
+# index without the contact keys to serve unfiltered pages from one range.
+LEAD_INDEXES = {
+    columns: "leads_by_" + "_".join(columns + ("contacts", "created"))
+    for r in range(len(FILTER_COLUMNS) + 1)
+    for columns in combinations(FILTER_COLUMNS, r)
+}
+# Full-text index over the searchable columns, kept in sync by triggers.
+# bm25 weights follow SEARCH_COLUMNS: a hit in the name counts most.
+SEARCH_COLUMNS = ("name", "category", "city")
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0)
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# English word endings cut from search words before prefix matching, so a word
+# also finds its relatives: "dental" -> dent* finds "dentist", "plumbing" ->
+# plumb* finds "plumber". Tried in order; the stem keeps SEARCH_MIN_STEM chars.
+SEARCH_SUFFIXES = ("ists", "ist", "ical", "ies", "ics", "ing", "ers", "ery", "ary", "al", "ic", "er", "es", "ry", "y", "s")
+SEARCH_MIN_STEM = 4
+FTS_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE leads_fts USING fts5(
+        {', '.join(SEARCH_COLUMNS)},
+        content='leads', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_insert AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts (rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_delete AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_update AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+        INSERT INTO leads_fts (rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+)
+TRUE_VALUES = ("1", "true", "yes", "y")
+FALSE_VALUES = ("0", "false", "no", "n")
+
+
+def _parse_bool(name: str, value) -> bool | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    value = str(value).lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid {name}: {value}")
+
+
+def _parse_timestamp(name: str, value) -> str | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}") from None
+
+
+@dataclass
+class LeadFilters:
+    city: str | None = None
+    source: str | None = None
+    category: str | None = None
+    has_email: bool | None = None
+    has_phone: bool | None = None
+    # created_at range: since is inclusive, until exclusive.
+    since: str | None = None
+    until: str | None = None
+
+    @classmethod
+    def from_params(cls, params) -> "LeadFilters":
+        return cls(
+            city=params.get("city") or None,
+            source=params.get("source") or None,
+            category=params.get("category") or None,
+            has_email=_parse_bool("has_email", params.get("has_email")),
+            has_phone=_parse_bool("has_phone", params.get("has_phone")),
+            since=_parse_timestamp("since", params.get("since")),
+            until=_parse_timestamp("until", params.get("until")),
+        )
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name) is not None}
+
+    def where(self) -> tuple[str, list[tuple[list[str], list]]]:
+        # Returns the index to read and the (clauses, params) of each range
+        # to read from it.
+        columns = tuple(column for column in FILTER_COLUMNS if getattr(self, column))
+        clauses = [f"{column} = ?" for column in columns]
+        params = [getattr(self, column) for column in columns]
+        if self.since:
+            clauses.append("created_at >= ?")
+            params.append(self.since)
+        if self.until:
+            clauses.append("created_at < ?")
+            params.append(self.until)
+        wanted = [getattr(self, "has_" + column) for column in CONTACT_COLUMNS]
+        states = [(w,) if w is not None else (True, False) for w in wanted]
+        ranges = [
+            (clauses + [f"({column} != '') = ?" for column in CONTACT_COLUMNS], params + [int(s) for s in state])
+            for state in product(*states)
+        ]
+        return LEAD_INDEXES[columns], ranges
+
+
+def search_stem(word: str) -> str:
+    for suffix in SEARCH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= SEARCH_MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+def search_expression(query: str) -> str:
+    # Plain words to an FTS5 query: every word must match, by its stem and as
+    # a prefix, so "dental" finds "dentist" and "amenity=dentist". The stem is
+    # a prefix of the word, so nothing the word itself matches is lost. FTS5
+    # operators in the input are treated as text. Single characters are
+    # dropped: the prefix index starts at two.
+    tokens = [t for t in SEARCH_TOKEN_RE.findall(query or "") if len(t) > 1]
+    if not tokens:
+        raise ValueError("Search query needs at least one word of two or more characters.")
+    return " ".join(f'"{search_stem(t.lower())}"*' for t in tokens)
+
+
+def encode_cursor(created_at: str, lead_id: int) -> str:
+    raw = json.dumps([created_at, lead_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, lead_id = json.loads(raw)
+        return str(created_at), int(lead_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.") from None
+
+
+# The export as it always was: a full table scan sorted by created_at alone,
+# so rows with the same created_at keep the order earlier exports gave them.
+# NOT INDEXED keeps the planner from reading the created_at index instead,
+# which breaks those ties by id.
+FILE_EXPORT_SQL = (
+    "SELECT name, email, phone, website, city, source, category, created_at "
+    "FROM leads NOT INDEXED ORDER BY created_at DESC"
+)
+
+
+def _select_ranges(columns, ranges, index: str | None = None) -> tuple[str, list]:
+    # Newest first. Several ranges are read as a UNION ALL, which SQLite
+    # merges in ORDER BY order without sorting.
+    hint = f" INDEXED BY {index}" if index else ""
+    selects = []
+    params = []
+    for clauses, range_params in ranges:
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        selects.append(f"SELECT {', '.join(columns)} FROM leads{hint}{where}")
+        params += range_params
+    return " UNION ALL ".join(selects) + " ORDER BY created_at DESC, id DESC", params
+
+
+KEY_DIGEST_BYTES = 16
+FIELD_DIGEST_BYTES = 8
+_NO_FIELD = bytes(FIELD_DIGEST_BYTES)
+
+
+def _digest(text: str, size: int) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=size).digest()
+
+
+def _field_digest(value: str | None) -> bytes:
+    return _digest(value, FIELD_DIGEST_BYTES) if value else _NO_FIELD
+
+
+class KnownLeads:
+    # Compact in-memory view of the leads table: a 128-bit digest of each
+    # (name, city, website) key mapped to 64-bit digests of the merged columns,
+    # packed into one bytes object. Digests this wide do not collide in
+    # practice, so a row that looks unchanged is unchanged and skipping its
+    # upsert loses nothing.
+    def __init__(self):
+        self._rows: dict[bytes, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def _key(name: str, city: str | None, website: str | None) -> bytes:
+        return _digest("\0".join((name or "", city or "", website or "")), KEY_DIGEST_BYTES)
+
+    @staticmethod
+    def _field(packed: bytes, i: int) -> bytes:
+        return packed[FIELD_DIGEST_BYTES * i:FIELD_DIGEST_BYTES * (i + 1)]
+
+    def add_row(self, name, city, website, email, phone, source, category) -> None:
+        self._rows[self._key(name, city, website)] = b"".join(
+            _field_digest(value) for value in (email, phone, source, category)
+        )
+
+    def has_contacts(self, lead: Lead) -> bool:
+        packed = self._rows.get(self._key(lead.name, lead.city, lead.website))
+        return bool(packed and self._field(packed, 0) != _NO_FIELD and self._field(packed, 1) != _NO_FIELD)
+
+    def would_change(self, lead: Lead) -> bool:
+        packed = self._rows.get(self._key(lead.name, lead.city, lead.website))
+        if packed is None:
+            return True
+        for i, column in enumerate(MERGED_COLUMNS):
+            value = _field_digest(getattr(lead, column))
+            if value != _NO_FIELD and value != self._field(packed, i):
+                return True
+        return False
+
+    def remember(self, lead: Lead) -> None:
+        key = self._key(lead.name, lead.city, lead.website)
+        packed = self._rows.get(key) or _NO_FIELD * len(MERGED_COLUMNS)
+        parts = []
+        for i, column in enumerate(MERGED_COLUMNS):
+            value = _field_digest(getattr(lead, column))
+            parts.append(value if value != _NO_FIELD else self._field(packed, i))
+        self._rows[key] = b"".join(parts)
+
+
+class _Writer:
+    # The only connection that writes to a database file in this process.
+    # Writes from every store (and every concurrent run) on the file are queued
+    # here and committed together, up to `max_batch` per transaction, so runs
+    # share commits instead of fighting over the write lock. Readers use their
+    # own connections and, in WAL mode, never wait for it.
+    def __init__(self, path: str, journal_mode: str, synchronous: str, cache_size_kb: int, busy_timeout_ms: int, max_batch: int):
+        self.path = path
+        self.pragmas = (
+            f"PRAGMA busy_timeout = {busy_timeout_ms}",
+            f"PRAGMA journal_mode = {journal_mode}",
+            f"PRAGMA synchronous = {synchronous}",
+            f"PRAGMA cache_size = {-cache_size_kb}",
+        )
+        self.max_batch = max(1, int(max_batch))
+        self.refs = 0
+        self.error = None
+        # Opened here so a bad path or pragma fails in the caller instead of
+        # killing the thread with writes still waiting on it.
+        ensure_parent_dir(path)
+        self._con = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        try:
+            for pragma in self.pragmas:
+                self._con.execute(pragma)
+        except Exception:
+            self._con.close()
+            raise
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        fut = Future()
+        self._queue.put((fn, args, fut))
+        if self.error is not None:
+            self._fail_queued()
+        return fut
+
+    def stop(self) -> None:
+        self._queue.put(None)
+
+    def _loop(self) -> None:
+        con = self._con
+        ops = []
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                ops = [item]
+                while len(ops) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    ops.append(item)
+                self._apply(con, ops)
+        except BaseException as exc:
+            # The thread is going away: nothing queued now or later may wait
+            # on it, and the next store on this path gets a fresh writer.
+            self.error = exc
+            with _writers_lock:
+                key = os.path.abspath(self.path)
+                if _writers.get(key) is self:
+                    del _writers[key]
+            for _, _, fut in ops:
+                if not fut.done():
+                    fut.set_exception(exc)
+            self._fail_queued()
+            raise
+        finally:
+            con.close()
+
+    def _fail_queued(self) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(RuntimeError(f"SQLite writer for {self.path} stopped: {self.error}"))
+
+    def _apply(self, con, ops) -> None:
+        results = []
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            for fn, args, _ in ops:
+                # One failing write is rolled back on its own and reported to
+                # its caller; the rest of the batch still commits.
+                con.execute("SAVEPOINT op")
+                try:
+                    results.append((fn(con, *args), None))
+                    con.execute("RELEASE op")
+                except Exception as exc:
+                    con.execute("ROLLBACK TO op")
+                    con.execute("RELEASE op")
+                    results.append((None, exc))
+            con.execute("COMMIT")
+        except Exception as exc:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            for _, _, fut in ops:
+                fut.set_exception(exc)
+            return
+        for (_, _, fut), (value, exc) in zip(ops, results):
+            if exc is None:
+                fut.set_result(value)
+            else:
+                fut.set_exception(exc)
+
+
+_writers: dict[str, _Writer] = {}
+_writers_lock = threading.Lock()
+
+
+def _acquire_writer(store: "LeadStore") -> _Writer:
+    key = os.path.abspath(store.path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _Writer(
+                store.path,
+                store.journal_mode,
+                store.synchronous,
+                store.cache_size_kb,
+                store.busy_timeout_ms,
+                store.max_write_batch,
+            )
+            _writers[key] = writer
+        writer.refs += 1
+        return writer
+
+
+def _release_writer(writer: _Writer) -> None:
+    with _writers_lock:
+        writer.refs -= 1
+        if writer.refs > 0:
+            return
+        key = os.path.abspath(writer.path)
+        if _writers.get(key) is writer:
+            del _writers[key]
+    # Queued writes are applied before the thread exits.
+    writer.stop()
+
+
+def _lead_params(lead: Lead) -> tuple:
+    return (
+        lead.name,
+        lead.email or "",
+        lead.phone or "",
+        lead.website or "",
+        lead.city or "",
+        lead.source or "",
+        lead.category or "",
+        lead.created_at.isoformat(),
+    )
 
 
 class LeadStore:
-    def __init__(self, path: str):
+    def __init__(
+        self,
+        path: str,
+        journal_mode: str = "wal",
+        synchronous: str = "normal",
+        cache_size_kb: int = 16384,
+        busy_timeout_ms: int = 5000,
+        max_write_batch: int = 64,
+    ):
         self.path = path
+        self.journal_mode = str(journal_mode).lower()
+        self.synchronous = str(synchronous).lower()
+        self.cache_size_kb = int(cache_size_kb)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.max_write_batch = int(max_write_batch)
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported SQLite journal_mode: {journal_mode}")
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported SQLite synchronous mode: {synchronous}")
+        self._con = None
+        self._writer = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "LeadStore":
+        app = cfg["app"]
+        sqlite_cfg = app.get("sqlite") or {}
+        return cls(
+            app["db_path"],
+            journal_mode=sqlite_cfg.get("journal_mode", "wal"),
+            synchronous=sqlite_cfg.get("synchronous", "normal"),
+            cache_size_kb=sqlite_cfg.get("cache_size_kb", 16384),
+            busy_timeout_ms=sqlite_cfg.get("busy_timeout_ms", 5000),
+            max_write_batch=sqlite_cfg.get("max_write_batch", 64),
+        )
 
     def connect(self):
-        ensure_parent_dir(self.path)
-        return sqlite3.connect(self.path)
+        # Read connection. Writes go through `_write`.
+        with self._lock:
+            if self._con is None:
+                ensure_parent_dir(self.path)
+                con = sqlite3.connect(self.path, check_same_thread=False)
+                con.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+                con.execute(f"PRAGMA cache_size = {-self.cache_size_kb}")
+                con.execute("PRAGMA query_only = ON")
+                self._con = con
+            return self._con
+
+    def _write(self, fn, *args):
+        # Runs `fn(con, *args)` on the shared writer thread and waits for its
+        # transaction to commit. `fn` must not return cursors: they would be
+        # finalized on the caller's thread.
+        with self._lock:
+            if self._writer is None:
+                self._writer = _acquire_writer(self)
+            writer = self._writer
+        return writer.submit(fn, *args).result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+            if self._writer is not None:
+                _release_writer(self._writer)
+                self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def init_db(self) -> None:
-        with self.connect() as con:
-            con.execute(
-                '''
-                CREATE TABLE IF NOT EXISTS leads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL DEFAULT '',
-                    phone TEXT NOT NULL DEFAULT '',
-                    website TEXT NOT NULL DEFAULT '',
-                    city TEXT NOT NULL DEFAULT '',
-                    source TEXT NOT NULL DEFAULT '',
-                    category TEXT NOT NULL DEFAULT '',
-                    created_at TEXT NOT NULL
-                )
-                '''
+        self._write(self._init_db)
+
+    @staticmethod
+    def _init_db(con) -> None:
+        con.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL DEFAULT '',
+                phone TEXT NOT NULL DEFAULT '',
+                website TEXT NOT NULL DEFAULT '',
+                city TEXT NOT NULL DEFAULT '',
+                source TEXT NOT NULL DEFAULT '',
+                category TEXT NOT NULL DEFAULT '',
+                created_at TEXT NOT NULL
             )
-            con.execute(
-                '''
-                CREATE UNIQUE INDEX IF NOT EXISTS leads_unique
-                ON leads (name, city, website)
-                '''
+            '''
+        )
+        con.execute(
+            '''
+            CREATE UNIQUE INDEX IF NOT EXISTS leads_unique
+            ON leads (name, city, website)
+            '''
+        )
+        for columns, index in LEAD_INDEXES.items():
+            keys = columns + tuple(f"{column} != ''" for column in CONTACT_COLUMNS) + ("created_at", "id")
+            con.execute(f"CREATE INDEX IF NOT EXISTS {index} ON leads ({', '.join(keys)})")
+        if con.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0]:
+            exists = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'leads_fts'").fetchone()
+            if not exists:
+                for statement in FTS_SCHEMA:
+                    con.execute(statement)
+                # Index rows written before the table existed.
+                con.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")
+        con.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                config TEXT NOT NULL,
+                stats TEXT NOT NULL DEFAULT '',
+                started_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
             )
+            '''
+        )
+        con.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS run_checkpoints (
+                run_id TEXT NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                source TEXT NOT NULL,
+                cursor TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, source)
+            )
+            '''
+        )
 
-    def upsert(self, lead: Lead) -> None:
-        with self.connect() as con:
+    def create_run(self, run_id: str, cfg: dict) -> None:
+        now = datetime.utcnow().isoformat()
+        params = (run_id, json.dumps(cfg), now, now)
+
+        def insert(con):
             con.execute(
+                "INSERT INTO runs (id, status, config, started_at, updated_at) VALUES (?, 'running', ?, ?, ?)",
+                params,
+            )
+
+        self._write(insert)
+
+    def claim_run(self, run_id: str, force: bool = False) -> bool:
+        # Marks a run as running again unless it completed or, without
+        # `force`, another process is still running it. One UPDATE under the
+        # write lock, so two processes cannot both claim the same run.
+        params = (datetime.utcnow().isoformat(), run_id, int(force))
+
+        def claim(con):
+            return con.execute(
+                "UPDATE runs SET status = 'running', updated_at = ? "
+                "WHERE id = ? AND status != 'completed' AND (status != 'running' OR ?)",
+                params,
+            ).rowcount == 1
+
+        return self._write(claim)
+
+    def load_run(self, run_id: str) -> dict | None:
+        with self._lock, self.connect() as con:
+            row = con.execute("SELECT status, config, stats FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            cursors = con.execute(
+                "SELECT source, cursor FROM run_checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return {
+            "id": run_id,
+            "status": row[0],
+            "config": json.loads(row[1]),
+            "stats": json.loads(row[2]) if row[2] else {},
+            "cursors": {source: json.loads(cursor) for source, cursor in cursors},
+        }
+
+    def save_checkpoints(self, run_id: str, cursors: dict, status: str | None = None, stats: dict | None = None) -> None:
+        now = datetime.utcnow().isoformat()
+        rows = [(run_id, source, json.dumps(cursor), now) for source, cursor in cursors.items()]
+        update = (status, json.dumps(stats) if stats is not None else None, now, run_id)
+
+        def save(con):
+            con.executemany(
                 '''
-                INSERT INTO leads (name, email, phone, website, city, source, category, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(name, city, website) DO UPDATE SET
-                    email = CASE WHEN excluded.email != '' THEN excluded.email ELSE leads.email END,
-                    phone = CASE WHEN excluded.phone != '' THEN excluded.phone ELSE leads.phone END,
-                    source = CASE WHEN excluded.source != '' THEN excluded.source ELSE leads.source END,
-                    category = CASE WHEN excluded.category != '' THEN excluded.category ELSE leads.category END
+                INSERT INTO run_checkpoints (run_id, source, cursor, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(run_id, source) DO UPDATE SET cursor = excluded.cursor, updated_at = excluded.updated_at
                 ''',
-                (
-                    lead.name,
-                    lead.email or "",
-                    lead.phone or "",
-                    lead.website or "",
-                    lead.city or "",
-                    lead.source or "",
-                    lead.category or "",
-                    lead.created_at.isoformat(),
-                ),
+                rows,
             )
+            con.execute(
+                "UPDATE runs SET status = COALESCE(?, status), stats = COALESCE(?, stats), updated_at = ? WHERE id = ?",
+                update,
+            )
+
+        self._write(save)
+
+    def upsert(self, lead: Lead) -> None:
+        self.upsert_many([lead])
+
+    def upsert_many(self, leads) -> int:
+        rows = [_lead_params(lead) for lead in leads]
+        if not rows:
+            return 0
+        def upsert(con):
+            con.executemany(UPSERT_SQL, rows)
+
+        self._write(upsert)
+        return len(rows)
+
+    def query_leads(self, filters: LeadFilters | None = None, limit: int = 100, cursor: str | None = None) -> tuple[list[dict], str | None]:
+        # One page, newest first, keyed on (created_at, id). Returns the rows
+        # and the cursor of the next page (None on the last one).
+        index, ranges = (filters or LeadFilters()).where()
+        if cursor:
+            created_at, lead_id = decode_cursor(cursor)
+            ranges = [(clauses + ["(created_at, id) < (?, ?)"], params + [created_at, lead_id]) for clauses, params in ranges]
+        sql, params = _select_ranges(LEAD_COLUMNS, ranges, index)
+        with self._lock:
+            rows = self.connect().execute(sql + " LIMIT ?", params + [limit + 1]).fetchall()
+        leads = [dict(zip(LEAD_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = leads[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return leads, next_cursor
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        # Best matches first. Each row carries its bm25 `score` (higher is
+        # better).
+        expression = search_expression(query)
+        columns = ", ".join(f"leads.{column}" for column in LEAD_COLUMNS)
+        weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+        sql = (
+            f"SELECT {columns}, -bm25(leads_fts, {weights}) AS score "
+            "FROM leads_fts JOIN leads ON leads.id = leads_fts.rowid "
+            f"WHERE leads_fts MATCH ? ORDER BY bm25(leads_fts, {weights}) LIMIT ?"
+        )
+        with self._lock:
+            try:
+                rows = self.connect().execute(sql, (expression, limit)).fetchall()
+            except sqlite3.OperationalError as exc:
+                if "leads_fts" in str(exc):
+                    raise RuntimeError("Full-text search needs SQLite built with FTS5.") from None
+                raise
+        return [dict(zip(LEAD_COLUMNS + ("score",), row)) for row in rows]
 
     def fetch_all(self):
-        with self.connect() as con:
+        with self._lock, self.connect() as con:
             rows = con.execute(
                 "SELECT name, email, phone, website, city, source, category, created_at FROM leads ORDER BY created_at DESC"
             ).fetchall()
@@ -83,6 +707,59 @@ class LeadStore:
             )
         return leads
 
+    def iter_export_rows(self, chunk_size: int = 5000, filters: LeadFilters | None = None, file_order: bool = False):
+        # No index hint here: exports also run on databases that predate the
+        # filter indexes, and the planner picks them up when they exist.
+        # `file_order` gives an unfiltered export the row order of the original
+        # CSV export; it sorts the whole table before the first row, so
+        # streamed responses read the index instead.
+        filters = filters or LeadFilters()
+        _, ranges = filters.where()
+        if file_order and not filters.to_dict():
+            sql, params = FILE_EXPORT_SQL, []
+        else:
+            columns = ("name", "email", "phone", "website", "city", "source", "category", "created_at", "id")
+            sql, params = _select_ranges(columns, ranges)
+        with self._lock:
+            cur = self.connect().execute(sql, params)
+        try:
+            while True:
+                with self._lock:
+                    rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [
+                    (
+                        r[0],
+                        r[1] or "",
+                        r[2] or "",
+                        r[3] or "",
+                        r[4] or "",
+                        r[5] or "",
+                        r[6] or "",
+                        r[7] or datetime.utcnow().isoformat(),
+                    )
+                    for r in rows
+                ]
+        finally:
+            cur.close()
+
+    def load_known(self, chunk_size: int = 5000) -> KnownLeads:
+        known = KnownLeads()
+        with self._lock:
+            cur = self.connect().execute(
+                "SELECT name, city, website, email, phone, source, category FROM leads"
+            )
+            try:
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        known.add_row(*row)
+            finally:
+                cur.close()
+        return known
+
     def export_csv(self, path: str) -> None:
-        leads = self.fetch_all()
-        write_csv(path, leads)
+        write_csv_rows(path, self.iter_export_rows(file_order=True))
@@ -0,0 +1,213 @@
+import re
+import unicodedata
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from .utils import normalize_website
+
+
+MATCH_KEYS = {"domain", "phone", "name"}
+MERGED_FIELDS = ("email", "phone", "category")
+NAME_STOPWORDS = {"the", "and", "of", "a", "ltd", "llc", "inc", "co", "gmbh", "sa", "srl", "bv", "plc"}
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "gov", "ac", "edu"}
+# Hosts shared by many unrelated businesses; they are keyed by host and first
+# path segment instead of by registered domain.
+SHARED_DOMAINS = {
+    "facebook.com", "instagram.com", "google.com", "goo.gl", "linktr.ee", "yelp.com",
+    "tripadvisor.com", "wixsite.com", "business.site", "blogspot.com", "wordpress.com",
+    "squarespace.com", "linkedin.com", "twitter.com", "x.com",
+}
+NAME_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def name_tokens(name: str | None) -> frozenset:
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = text.replace("'", "").replace("’", "").replace("&", " and ")
+    return frozenset(t for t in NAME_TOKEN_RE.findall(text) if t not in NAME_STOPWORDS)
+
+
+def registered_domain(website: str | None) -> str:
+    url = normalize_website(website)
+    if not url:
+        return ""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().split("@")[-1].split(":")[0].rstrip(".")
+    labels = [label for label in host.split(".") if label]
+    if labels and labels[0] == "www":
+        labels = labels[1:]
+    if len(labels) < 2:
+        return ""
+    keep = 3 if len(labels) >= 3 and labels[-2] in SECOND_LEVEL_LABELS and len(labels[-1]) == 2 else 2
+    domain = ".".join(labels[-keep:])
+    if domain in SHARED_DOMAINS:
+        segment = parsed.path.strip("/").split("/")[0].lower()
+        return f"{'.'.join(labels)}/{segment}" if segment else ""
+    return domain
+
+
+def phone_key(phone: str | None) -> str:
+    digits = "".join(ch for ch in phone or "" if ch.isdigit())
+    if len(digits) < 7:
+        return ""
+    # Compare the trailing subscriber digits so "+49 30 ..." and "030 ..."
+    # (country code vs trunk prefix) meet.
+    return digits[-9:]
+
+
+def _city(lead) -> str:
+    return " ".join(sorted(name_tokens(lead.city)))
+
+
+class _Entry:
+    __slots__ = ("lead", "tokens", "city", "phone")
+
+    def __init__(self, lead):
+        self.lead = lead
+        self.tokens = name_tokens(lead.name)
+        self.city = _city(lead)
+        self.phone = phone_key(lead.phone)
+
+
+class LeadResolver:
+    # Blocking index over the leads seen in one run: each lead is only compared
+    # with earlier leads that share a domain, phone or name-token block.
+    def __init__(
+        self,
+        match_on=("domain", "phone", "name"),
+        name_similarity: float = 0.85,
+        same_city: bool = True,
+        phone_conflict_blocks: bool = True,
+        prefer_sources=(),
+        max_block_size: int = 64,
+    ):
+        unknown = set(match_on) - MATCH_KEYS
+        if unknown:
+            raise ValueError(f"Unsupported dedupe match keys: {', '.join(sorted(unknown))}")
+        self.match_on = set(match_on)
+        self.name_similarity = float(name_similarity)
+        self.same_city = bool(same_city)
+        self.phone_conflict_blocks = bool(phone_conflict_blocks)
+        self.source_rank = {s: i for i, s in enumerate(prefer_sources or [])}
+        self.max_block_size = max(1, int(max_block_size))
+        self._blocks: dict[tuple, list[_Entry]] = defaultdict(list)
+        self.merged = 0
+        self.changed: dict[int, object] = {}
+        # Leads handed on by resolve() and not yet back through release().
+        # Another thread (enrichment) may be writing to them, so duplicates
+        # found meanwhile are merged on release.
+        self._in_flight: dict[int, _Entry] = {}
+        self._deferred: dict[int, list] = defaultdict(list)
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "LeadResolver | None":
+        opts = cfg.get("dedupe") or {}
+        if not opts.get("enabled", True):
+            return None
+        return cls(
+            match_on=opts.get("match_on") or ("domain", "phone", "name"),
+            name_similarity=opts.get("name_similarity", 0.85),
+            same_city=opts.get("same_city", True),
+            phone_conflict_blocks=opts.get("phone_conflict_blocks", True),
+            prefer_sources=opts.get("prefer_sources") or (),
+            max_block_size=opts.get("max_block_size", 64),
+        )
+
+    def _keys(self, entry: _Entry):
+        lead = entry.lead
+        if "domain" in self.match_on:
+            domain = registered_domain(lead.website)
+            if domain:
+                yield ("domain", domain)
+        if "phone" in self.match_on and entry.phone:
+            yield ("phone", entry.phone)
+        if "name" in self.match_on:
+            for token in entry.tokens:
+                yield ("name", entry.city, token)
+
+    def _matches(self, kind: str, entry: _Entry, other: _Entry) -> bool:
+        if self.same_city and entry.city and other.city and entry.city != other.city:
+            return False
+        if kind == "phone":
+            return True
+        if self.phone_conflict_blocks and entry.phone and other.phone and entry.phone != other.phone:
+            return False
+        if kind == "domain":
+            return True
+        if not entry.tokens or not other.tokens:
+            return False
+        overlap = len(entry.tokens & other.tokens) / len(entry.tokens | other.tokens)
+        return overlap >= self.name_similarity
+
+    def _find(self, entry: _Entry) -> _Entry | None:
+        for key in self._keys(entry):
+            block = self._blocks.get(key)
+            if not block or (key[0] == "name" and len(block) > self.max_block_size):
+                continue
+            for other in block:
+                if self._matches(key[0], entry, other):
+                    return other
+        return None
+
+    def _index(self, entry: _Entry) -> None:
+        for key in self._keys(entry):
+            self._blocks[key].append(entry)
+
+    def _prefers(self, dup, canonical) -> bool:
+        if not self.source_rank:
+            return False
+        worst = len(self.source_rank)
+        return self.source_rank.get(dup.source, worst) < self.source_rank.get(canonical.source, worst)
+
+    def _link(self, canonical: _Entry, dup) -> None:
+        # The duplicate's domain and phone now lead to the canonical too. Name
+        # blocks are left alone: the canonical keeps its own name.
+        for key in self._keys(_Entry(dup)):
+            if key[0] == "name":
+                continue
+            block = self._blocks[key]
+            if canonical not in block:
+                block.append(canonical)
+
+    def _merge(self, canonical: _Entry, dup) -> bool:
+        lead = canonical.lead
+        override = self._prefers(dup, lead)
+        changed = False
+        for field in MERGED_FIELDS:
+            value = getattr(dup, field)
+            if value and (not getattr(lead, field) or (override and getattr(lead, field) != value)):
+                setattr(lead, field, value)
+                changed = True
+        sources = lead.raw.get("merged_sources", [])
+        if dup.source and dup.source != lead.source and dup.source not in sources:
+            lead.raw["merged_sources"] = sources + [dup.source]
+        if changed:
+            canonical.phone = phone_key(lead.phone)
+        return changed
+
+    def resolve(self, lead):
+        # Returns the canonical lead and whether `lead` is new. A new lead is
+        # in flight until it is passed to release().
+        entry = _Entry(lead)
+        canonical = self._find(entry)
+        if canonical is None:
+            self._index(entry)
+            self._in_flight[id(lead)] = entry
+            return lead, True
+        self.merged += 1
+        self._link(canonical, lead)
+        key = id(canonical.lead)
+        if key in self._in_flight:
+            self._deferred[key].append(lead)
+        elif self._merge(canonical, lead):
+            self.changed[key] = canonical.lead
+        return canonical.lead, False
+
+    def release(self, lead) -> None:
+        # Applies the merges that waited for `lead`; call it once nothing else
+        # writes to the lead any more.
+        entry = self._in_flight.pop(id(lead), None)
+        if entry is None:
+            return
+        for dup in self._deferred.pop(id(lead), ()):
+            self._merge(entry, dup)
@@ -0,0 +1,157 @@
+import warnings
+from functools import cached_property
+from urllib.parse import unquote, urljoin, urlparse
+
+from bs4 import BeautifulSoup, NavigableString
+
+
+PARSERS = ("auto", "selectolax", "lxml", "html.parser")
+HIDDEN_TAGS = ["script", "style", "noscript", "template"]
+# Joins text nodes. Contact patterns cannot cross it (a plain space or newline
+# would let numbers in adjacent cells or list items run together), so a match
+# never spans two nodes, as when the raw markup was scanned.
+NODE_SEPARATOR = " | "
+
+
+class _SoupTree:
+    def __init__(self, html: str, features: str):
+        self.soup = BeautifulSoup(html, features)
+
+    def first_text(self, tag: str) -> str:
+        el = self.soup.find(tag)
+        return el.get_text(strip=True) if el else ""
+
+    def anchors(self, selector: str = "a[href]"):
+        for a in self.soup.select(selector):
+            href = a.get("href")
+            if href:
+                yield href, a.get_text(" ", strip=True)
+
+    def visible_text(self) -> str:
+        parts = []
+        for s in self.soup.find_all(string=True):
+            if type(s) is NavigableString and s.parent.name not in HIDDEN_TAGS:
+                s = s.strip()
+                if s:
+                    parts.append(s)
+        return NODE_SEPARATOR.join(parts)
+
+
+class _LexborTree:
+    def __init__(self, html: str):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self.tree = LexborHTMLParser(html)
+
+    def first_text(self, tag: str) -> str:
+        el = self.tree.css_first(tag)
+        return el.text(strip=True) if el else ""
+
+    def anchors(self, selector: str = "a[href]"):
+        for a in self.tree.css(selector):
+            href = a.attributes.get("href")
+            if href:
+                yield href, a.text(separator=" ", strip=True)
+
+    def visible_text(self) -> str:
+        tree = self.tree.clone()
+        tree.strip_tags(HIDDEN_TAGS)
+        return tree.root.text(separator=NODE_SEPARATOR, strip=True) if tree.root else ""
+
+
+def _available(parser: str) -> bool:
+    try:
+        if parser == "selectolax":
+            import selectolax.lexbor  # noqa: F401
+        elif parser == "lxml":
+            import lxml  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+_resolved: dict[str, str] = {}
+
+
+def resolve_parser(name: str | None) -> str:
+    name = (name or "auto").lower()
+    if name not in PARSERS:
+        raise ValueError(f"Unsupported HTML parser: {name}")
+    if name not in _resolved:
+        choice = name
+        if name == "auto":
+            choice = next((p for p in ("selectolax", "lxml") if _available(p)), "html.parser")
+        elif not _available(name):
+            warnings.warn(f"HTML parser {name!r} is not installed; falling back to html.parser.")
+            choice = "html.parser"
+        _resolved[name] = choice
+    return _resolved[name]
+
+
+# One parse per page: every field is computed lazily from the same tree.
+class Document:
+    def __init__(self, html: str, url: str = "", parser: str = "auto"):
+        self.html = html or ""
+        self.url = url
+        self.parser = resolve_parser(parser)
+        if self.parser == "selectolax":
+            self._tree = _LexborTree(self.html)
+        else:
+            self._tree = _SoupTree(self.html, self.parser)
+
+    @cached_property
+    def title(self) -> str:
+        return self._tree.first_text("title")[:200]
+
+    @cached_property
+    def name(self) -> str:
+        for tag in ("h1", "h2"):
+            text = self._tree.first_text(tag)
+            if text:
+                return text[:200]
+        if self.title:
+            return self.title
+        if self.url:
+            return urlparse(self.url).netloc.replace("www.", "")
+        return ""
+
+    def _join(self, anchors):
+        # Hrefs that cannot be joined ("http://[broken") are skipped.
+        for href, text in anchors:
+            try:
+                yield urljoin(self.url, href.strip()), text
+            except ValueError:
+                continue
+
+    @cached_property
+    def links(self) -> list[tuple[str, str]]:
+        return list(self._join(self._tree.anchors()))
+
+    def select_links(self, selector: str) -> list[str]:
+        return [href for href, _ in self._join(self._tree.anchors(selector))]
+
+    @cached_property
+    def text(self) -> str:
+        return self._tree.visible_text()
+
+    def _targets(self, scheme: str) -> list[str]:
+        out = []
+        for href, _ in self.links:
+            if href.lower().startswith(scheme):
+                target = unquote(href[len(scheme):].split("?", 1)[0]).strip()
+                if target:
+                    out.append(target)
+        return list(dict.fromkeys(out))
+
+    @cached_property
+    def mailto(self) -> list[str]:
+        return self._targets("mailto:")
+
+    @cached_property
+    def tel(self) -> list[str]:
+        return self._targets("tel:")
+
+
+def parse_html(html: str, url: str, cfg: dict | None = None) -> Document:
+    parser = ((cfg or {}).get("app") or {}).get("html_parser", "auto")
+    return Document(html, url, parser)
@@ -1,18 +1,59 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urlparse
+
 import requests
-from bs4 import BeautifulSoup
 
-from .utils import extract_emails, extract_phones, normalize_website
+from .contacts import contacts_from_document
+from .document import parse_html
+from .http_cache import get_http_cache
+from .http_client import get_session, http_timeout
+from .utils import normalize_website
+
+
+NEGATIVE_CACHE_STATUSES = {404, 410}
+# Path/link-text hints for pages that usually carry contact details, by weight.
+CONTACT_PAGE_HINTS = (
+    ("contact", 10),
+    ("kontakt", 10),
+    ("impressum", 8),
+    ("imprint", 8),
+    ("about", 6),
+    ("location", 4),
+    ("find-us", 4),
+    ("team", 3),
+    ("legal", 2),
+)
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp4", ".doc", ".docx")
 
 
 def fetch_html(url: str, cfg: dict) -> str:
-    timeout = cfg["app"].get("request_timeout_s", 15)
-    headers = {"User-Agent": cfg["app"].get("user_agent", "LeadFinderBot/0.1")}
-    resp = requests.get(url, timeout=timeout, headers=headers, allow_redirects=True)
+    cache = get_http_cache(cfg)
+    entry = cache.get(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        return entry.html
+
+    headers = entry.validators if entry and not entry.negative else {}
+    resp = get_session(cfg).get(url, timeout=http_timeout(cfg, 15), headers=headers, allow_redirects=True)
+    if resp.status_code == 304 and entry:
+        cache.revalidated(url)
+        return entry.html
     if not resp.ok:
+        if cache and resp.status_code in NEGATIVE_CACHE_STATUSES:
+            cache.put(url, resp.status_code)
         return ""
     ctype = resp.headers.get("content-type", "")
     if "text/html" not in ctype:
+        if cache:
+            cache.put(url, resp.status_code)
         return ""
+    if cache:
+        cache.put(
+            url,
+            resp.status_code,
+            resp.text,
+            etag=resp.headers.get("ETag", ""),
+            last_modified=resp.headers.get("Last-Modified", ""),
+        )
     return resp.text
 
 
@@ -27,27 +68,107 @@ def pick_email(emails: list[str], cfg: dict) -> str | None:
     return emails[0] if emails else None
 
 
-def enrich_lead_from_website(lead, cfg: dict):
+def _site_host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def rank_contact_links(doc, limit: int) -> list[str]:
+    host = _site_host(doc.url)
+    home = urldefrag(doc.url)[0].rstrip("/")
+    scored = {}
+    for href, text in doc.links:
+        link = urldefrag(href)[0]
+        parsed = urlparse(link)
+        if parsed.scheme not in ("http", "https") or _site_host(link) != host:
+            continue
+        if link.rstrip("/") == home or parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            continue
+        haystack = f"{parsed.path} {text}".lower()
+        score = sum(weight for hint, weight in CONTACT_PAGE_HINTS if hint in haystack)
+        # Only pages that look like contact pages are worth a request.
+        if score <= 0:
+            continue
+        if score > scored.get(link, 0):
+            scored[link] = score
+    ranked = sorted(scored, key=lambda link: -scored[link])
+    return ranked[:limit]
+
+
+def _fetch_page(url: str, cfg: dict, limiter=None) -> str:
+    if limiter:
+        with limiter.slot(url):
+            return fetch_html(url, cfg)
+    return fetch_html(url, cfg)
+
+
+def _fetch_subpage(url: str, cfg: dict, limiter=None):
+    # A subpage that cannot be fetched or parsed adds nothing; the lead keeps
+    # what the homepage and the other subpages produced.
+    try:
+        html = _fetch_page(url, cfg, limiter)
+        return contacts_from_document(parse_html(html, url, cfg)) if html else None
+    except requests.RequestException:
+        return None
+    except Exception as exc:
+        print(f"Contact page {url} failed: {type(exc).__name__}: {exc}")
+        return None
+
+
+def _apply_contacts(lead, contacts, cfg: dict) -> None:
+    if not lead.email:
+        lead.email = pick_email([c.value for c in contacts.emails], cfg)
+    if not lead.phone and contacts.phone:
+        lead.phone = contacts.phone
+
+
+def _crawl_contact_pages(lead, links: list[str], cfg: dict, limiter=None) -> None:
+    workers = max(1, min(len(links), int(cfg.get("enrichment", {}).get("per_host_concurrency", 2))))
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="contact-page") as pool:
+        pending = {pool.submit(_fetch_subpage, link, cfg, limiter): rank for rank, link in enumerate(links)}
+        email = bool(lead.email)
+        phone = bool(lead.phone)
+        while pending and not (email and phone):
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                contacts = future.result()
+                results[pending.pop(future)] = contacts
+                if contacts:
+                    email = email or bool(contacts.emails)
+                    phone = phone or bool(contacts.phones)
+        # Found everything: pages that have not started yet are never fetched.
+        for future in pending:
+            future.cancel()
+    # Apply in link-rank order so the outcome does not depend on which fetch finished first.
+    for rank in sorted(results):
+        if results[rank]:
+            _apply_contacts(lead, results[rank], cfg)
+
+
+def enrich_lead_from_website(lead, cfg: dict, limiter=None):
     if not lead.website:
         return lead
     url = normalize_website(lead.website)
     if not url:
         return lead
-    html = fetch_html(url, cfg)
+    try:
+        html = _fetch_page(url, cfg, limiter)
+    except requests.RequestException:
+        # An unreachable site leaves the lead as the source found it.
+        return lead
     if not html:
         return lead
 
-    emails = extract_emails(html)
-    if emails and not lead.email:
-        lead.email = pick_email(emails, cfg)
+    doc = parse_html(html, url, cfg)
+    _apply_contacts(lead, contacts_from_document(doc), cfg)
 
-    if not lead.phone:
-        phones = extract_phones(html)
-        if phones:
-            lead.phone = phones[0]
+    if not lead.name and doc.title:
+        lead.name = doc.title
 
-    if not lead.name:
-        soup = BeautifulSoup(html, "html.parser")
-        if soup.title and soup.title.get_text(strip=True):
-            lead.name = soup.title.get_text(strip=True)[:200]
+    max_pages = int(cfg.get("enrichment", {}).get("max_pages_per_site", 1))
+    if max_pages > 1 and not (lead.email and lead.phone):
+        links = rank_contact_links(doc, max_pages - 1)
+        if links:
+            _crawl_contact_pages(lead, links, cfg, limiter)
     return lead
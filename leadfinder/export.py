@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import zlib
+
+from .utils import CSV_FIELDS, ensure_parent_dir
+
+
+FORMATS = ("csv", "jsonl", "parquet")
+COMPRESSIONS = ("gzip", "zstd")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "gzip": "application/gzip",
+    "zstd": "application/zstd",
+}
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# Parquet readers work best with large row groups; rows are buffered up to
+# this many before a group is written.
+PARQUET_ROW_GROUP = 50_000
+
+
+def check_export(fmt: str, compression: str | None = None) -> None:
+    # Fails before anything is streamed, so a server can still send an error
+    # status instead of a truncated body.
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt} (expected one of {', '.join(FORMATS)})")
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression} (expected one of {', '.join(COMPRESSIONS)})")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise RuntimeError("zstd compression needs zstandard: pip install zstandard") from None
+
+
+def media_type(fmt: str, compression: str | None = None) -> str:
+    return MEDIA_TYPES[compression or fmt]
+
+
+def filename(fmt: str, compression: str | None = None, stem: str = "leads") -> str:
+    return f"{stem}.{fmt}{SUFFIXES.get(compression, '')}"
+
+
+def _csv_chunks(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_FIELDS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _jsonl_chunks(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(CSV_FIELDS, row)), ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    # Write-only file handed to pyarrow; the bytes written so far are taken
+    # out after each row group.
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _parquet_chunks(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.string()) for name in CSV_FIELDS])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    pending = []
+
+    def write_group():
+        columns = list(zip(*pending))
+        writer.write_table(pa.table([pa.array(col, pa.string()) for col in columns], schema=schema))
+        pending.clear()
+
+    try:
+        for rows in chunks:
+            pending.extend(rows)
+            if len(pending) >= PARQUET_ROW_GROUP:
+                write_group()
+                yield sink.take()
+        if pending:
+            write_group()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def _compressed(stream, compression: str | None):
+    if not compression:
+        yield from stream
+        return
+    if compression == "gzip":
+        comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+    else:
+        import zstandard
+
+        comp = zstandard.ZstdCompressor().compressobj()
+    for data in stream:
+        out = comp.compress(data)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def export_stream(store, fmt: str, filters=None, compression: str | None = None, chunk_size: int = 5000, file_order: bool = False):
+    # Encoded export as a stream of byte chunks, read from the database one
+    # cursor chunk at a time.
+    check_export(fmt, compression)
+    chunks = store.iter_export_rows(chunk_size, filters, file_order)
+    if fmt == "csv":
+        stream = _csv_chunks(chunks)
+    elif fmt == "jsonl":
+        stream = _jsonl_chunks(chunks)
+    else:
+        stream = _parquet_chunks(chunks)
+    for data in _compressed(stream, compression):
+        if data:
+            yield data
+
+
+def write_export(store, path: str, fmt: str, filters=None, compression: str | None = None, chunk_size: int = 5000) -> None:
+    check_export(fmt, compression)
+    ensure_parent_dir(path)
+    with open(path, "wb") as f:
+        for data in export_stream(store, fmt, filters, compression, chunk_size, file_order=True):
+            f.write(data)
@@ -0,0 +1,163 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .utils import ensure_parent_dir
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_cache_key(url: str) -> str:
+    # "" for URLs that cannot be parsed (bad port, broken IPv6 host); those are
+    # not cached and fail in requests as InvalidURL, as they did before.
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return ""
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") or ""
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    html: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+
+    @property
+    def negative(self) -> bool:
+        return not self.html
+
+    @property
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    def __init__(self, path: str, ttl_s: float, negative_ttl_s: float, max_bytes: int):
+        self.path = path
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        self._con = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode = wal")
+        self._con.execute("PRAGMA synchronous = normal")
+        self._con.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                html TEXT NOT NULL DEFAULT '',
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            '''
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._total = self._con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> CachedResponse | None:
+        key = normalize_cache_key(url)
+        if not key:
+            return None
+        with self._lock:
+            row = self._con.execute(
+                "SELECT status, html, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._con.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(*row)
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        ttl = self.negative_ttl_s if entry.negative else self.ttl_s
+        return time.time() - entry.fetched_at < ttl
+
+    def put(self, url: str, status: int, html: str = "", etag: str = "", last_modified: str = "") -> None:
+        key = normalize_cache_key(url)
+        if not key:
+            return
+        html = html if status == 200 else ""
+        size = len(key) + len(html.encode("utf-8", "replace"))
+        now = time.time()
+        with self._lock:
+            old = self._con.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._con.execute(
+                '''
+                INSERT OR REPLACE INTO responses (key, status, html, etag, last_modified, fetched_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (key, status, html, etag or "", last_modified or "", now, now, size),
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def revalidated(self, url: str) -> None:
+        key = normalize_cache_key(url)
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            self._con.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+
+    def _evict(self) -> None:
+        target = self.max_bytes * 0.9
+        cur = self._con.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC")
+        drop = []
+        for key, size in cur:
+            if self._total <= target:
+                break
+            drop.append((key,))
+            self._total -= size
+        cur.close()
+        self._con.executemany("DELETE FROM responses WHERE key = ?", drop)
+
+
+_caches: dict[str, HttpCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_http_cache(cfg: dict) -> HttpCache | None:
+    app = cfg.get("app", {})
+    opts = app.get("http_cache") or {}
+    if not opts.get("enabled"):
+        return None
+    path = str(Path(app.get("cache_dir", "data/cache")) / "http_cache.db")
+    ttl_s = opts.get("ttl_s", 7 * 86400)
+    negative_ttl_s = opts.get("negative_ttl_s", 86400)
+    max_bytes = int(float(opts.get("max_mb", 256)) * 1024 * 1024)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = HttpCache(path, ttl_s, negative_ttl_s, max_bytes)
+            _caches[path] = cache
+        else:
+            cache.ttl_s, cache.negative_ttl_s, cache.max_bytes = float(ttl_s), float(negative_ttl_s), max_bytes
+        return cache
@@ -0,0 +1,43 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+_sessions: dict[tuple, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(cfg: dict) -> requests.Session:
+    app = cfg.get("app", {})
+    opts = app.get("http") or {}
+    user_agent = app.get("user_agent", "LeadFinderBot/0.1")
+    pool_connections = int(opts.get("pool_connections", 32))
+    pool_maxsize = int(opts.get("pool_maxsize", 16))
+    max_retries = int(opts.get("max_retries", 0))
+    key = (user_agent, pool_connections, pool_maxsize, max_retries)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=max_retries,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            # requests already advertises gzip/deflate, plus br when brotli is
+            # installed; urllib3 decodes the body transparently.
+            session.headers["User-Agent"] = user_agent
+            _sessions[key] = session
+        return session
+
+
+def http_timeout(cfg: dict, default: float = 20) -> tuple[float, float]:
+    app = cfg.get("app", {})
+    opts = app.get("http") or {}
+    read = float(app.get("request_timeout_s", default))
+    connect = float(opts.get("connect_timeout_s", min(read, 10)))
+    return connect, read
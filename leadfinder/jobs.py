@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .pipeline import run_pipeline
+
+
+FINISHED_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+class Job:
+    def __init__(self, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.status = "queued"
+        self.progress: dict = {}
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def _update(self, **fields) -> None:
+        with self._cond:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            self._cond.notify_all()
+
+    def report(self, progress: dict) -> None:
+        self._update(progress=progress)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def to_dict(self) -> dict:
+        with self._cond:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "params": self.params,
+                "progress": self.progress,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    # Pipeline runs on a bounded pool; finished jobs are kept for
+    # `max_history` lookups before the oldest are forgotten.
+    def __init__(self, max_workers: int = 2, max_history: int = 100):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="job")
+        self.max_history = max(1, int(max_history))
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        cfg: dict,
+        params: dict,
+        export_path: str | None = None,
+        dry_run: bool = False,
+        resume=None,
+        overrides: dict | None = None,
+    ) -> Job:
+        job = Job(params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(self._run, job, cfg, export_path, dry_run, resume, overrides)
+        return job
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job, cfg: dict, export_path, dry_run, resume, overrides) -> None:
+        if job.cancel_event.is_set():
+            job._update(status="cancelled", finished_at=time.time())
+            return
+        job._update(status="running", started_at=time.time())
+        try:
+            stats = run_pipeline(
+                cfg,
+                export_path=export_path,
+                dry_run=dry_run,
+                resume=resume,
+                progress=job.report,
+                cancel=job.cancel_event,
+                overrides=overrides,
+            )
+        except Exception as exc:
+            job._update(status="failed", error=str(exc), finished_at=time.time())
+            return
+        status = "cancelled" if stats.get("cancelled") else "succeeded"
+        job._update(status=status, result=stats, progress=stats, finished_at=time.time())
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job._update(status="cancelled", finished_at=time.time())
+        return job
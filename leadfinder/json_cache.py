@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import threading
+import time
+
+from .utils import ensure_parent_dir
+
+
+class JsonCache:
+    def __init__(self, path: str, table: str, ttl_s: float, negative_ttl_s: float = 0):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._con as con:
+            con.execute("PRAGMA journal_mode = wal")
+            con.execute(
+                f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    query TEXT PRIMARY KEY,
+                    result TEXT,
+                    fetched_at REAL NOT NULL
+                )
+                '''
+            )
+            con.execute(f"CREATE INDEX IF NOT EXISTS {table}_fetched ON {table} (fetched_at)")
+
+    def _key(self, query: str) -> str:
+        return query
+
+    def get(self, query: str):
+        with self._lock:
+            row = self._con.execute(
+                f"SELECT result, fetched_at FROM {self.table} WHERE query = ?",
+                (self._key(query),),
+            ).fetchone()
+        if row is None:
+            return None, False
+        result = json.loads(row[0]) if row[0] else None
+        ttl = self.ttl_s if result else self.negative_ttl_s
+        if time.time() - row[1] > ttl:
+            return None, False
+        return result, True
+
+    def put(self, query: str, result) -> None:
+        payload = json.dumps(result) if result else None
+        with self._lock, self._con as con:
+            con.execute(
+                f"INSERT OR REPLACE INTO {self.table} (query, result, fetched_at) VALUES (?, ?, ?)",
+                (self._key(query), payload, time.time()),
+            )
+
+    def put_many(self, items, only_if_empty: bool = False) -> None:
+        now = time.time()
+        rows = [(self._key(q), json.dumps(r) if r else None, now) for q, r in items]
+        with self._lock, self._con as con:
+            if only_if_empty and con.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone():
+                return
+            con.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (query, result, fetched_at) VALUES (?, ?, ?)",
+                rows,
+            )
+
+
+_caches: dict[tuple, JsonCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_json_cache(path: str, table: str, ttl_s: float, negative_ttl_s: float = 0, factory=JsonCache) -> JsonCache:
+    with _caches_lock:
+        cache = _caches.get((path, table))
+        if cache is None:
+            cache = factory(path, table, ttl_s, negative_ttl_s)
+            _caches[(path, table)] = cache
+        cache.ttl_s = float(ttl_s)
+        cache.negative_ttl_s = float(negative_ttl_s)
+    return cache
@@ -1,4 +1,15 @@
+import queue
+import threading
+import time
+from collections import deque
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+
+from .checkpoint import RunCheckpoint, SourceIncomplete
+from .config import deep_merge
+from .concurrency import HostLimiter, put_until_stopped
 from .db import LeadStore
+from .dedupe import LeadResolver
 from .enrich import enrich_lead_from_website
 from .filters import passes_filters
 from .sources.osm_overpass import search_osm_overpass
@@ -9,47 +20,342 @@ from .sources.website_crawl import crawl_websites
 from .utils import normalize_website, write_csv
 
 
-def iter_sources(cfg: dict):
+SOURCES = [
+    ("osm_overpass", search_osm_overpass),
+    ("google_places", search_google_places),
+    ("google_maps_browser", crawl_google_maps),
+    ("directories", crawl_directories),
+    ("websites", crawl_websites),
+]
+
+_SOURCE_DONE = object()
+
+
+class _SourceCursor:
+    __slots__ = ("cursor",)
+
+    def __init__(self, cursor: dict):
+        self.cursor = cursor
+
+
+def enabled_sources(cfg: dict):
     sources = cfg.get("sources", {})
-    if sources.get("osm_overpass", {}).get("enabled"):
-        yield from search_osm_overpass(cfg)
-    if sources.get("google_places", {}).get("enabled"):
-        yield from search_google_places(cfg)
-    if sources.get("google_maps_browser", {}).get("enabled"):
-        yield from crawl_google_maps(cfg)
-    if sources.get("directories", {}).get("enabled"):
-        yield from crawl_directories(cfg)
-    if sources.get("websites", {}).get("enabled"):
-        yield from crawl_websites(cfg)
-
-
-def run_pipeline(cfg: dict, export_path: str | None = None, dry_run: bool = False) -> dict:
+    return [(name, fn) for name, fn in SOURCES if sources.get(name, {}).get("enabled")]
+
+
+def _run_source(name, fn, cfg, out, stop, stats, checkpoint=None):
+    # Cursors travel through the same queue as the leads, so they stay ordered
+    # after the leads the source yielded before saving them.
+    source_checkpoint = None
+    if checkpoint:
+        source_checkpoint = checkpoint.source(
+            name, lambda source, cursor: put_until_stopped(out, (source, _SourceCursor(cursor)), stop)
+        )
+    try:
+        for lead in fn(cfg, checkpoint=source_checkpoint):
+            if not put_until_stopped(out, (name, lead), stop):
+                return
+    except SourceIncomplete as exc:
+        stats[name]["error"] = str(exc)
+        stats[name]["skipped"] = exc.skipped
+        print(f"Source {name} incomplete: {exc}")
+    except Exception as exc:
+        stats[name]["error"] = f"{type(exc).__name__}: {exc}"
+        print(f"Source {name} failed: {exc}")
+    finally:
+        put_until_stopped(out, (name, _SOURCE_DONE), stop)
+
+
+def iter_sources(cfg: dict, stats: dict | None = None, checkpoint=None, cancel=None):
+    sources = enabled_sources(cfg)
+    if checkpoint:
+        sources = [(name, fn) for name, fn in sources if not checkpoint.is_done(name)]
+    stats = {} if stats is None else stats
+    for name, _ in sources:
+        stats[name] = {"fetched": 0, "error": None}
+    if not sources:
+        return
+
+    # Each source runs in its own thread and feeds one bounded queue, so slow
+    # sources overlap instead of running back to back.
+    out = queue.Queue(maxsize=max(1, int(cfg["app"].get("source_queue_size", 256))))
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=_run_source,
+            args=(name, fn, cfg, out, stop, stats, checkpoint),
+            name=f"source-{name}",
+            daemon=True,
+        )
+        for name, fn in sources
+    ]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    pulled = 0
+    try:
+        while running:
+            try:
+                name, lead = out.get(timeout=0.2)
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    return
+                continue
+            if lead is _SOURCE_DONE:
+                running -= 1
+                if checkpoint and not stats[name]["error"]:
+                    checkpoint.mark(pulled, name, {"done": True})
+                continue
+            if isinstance(lead, _SourceCursor):
+                if checkpoint:
+                    checkpoint.mark(pulled, name, lead.cursor)
+                continue
+            stats[name]["fetched"] += 1
+            pulled += 1
+            yield lead
+    finally:
+        stop.set()
+
+
+def _resolve(item, counters: dict | None = None):
+    lead, future = item
+    if future is None:
+        return lead
+    try:
+        return future.result()
+    except Exception as exc:
+        # One lead that breaks enrichment goes on as the source found it
+        # instead of stopping every source.
+        print(f"Enrichment of {lead.name!r} ({lead.website}) failed: {type(exc).__name__}: {exc}")
+        if counters is not None:
+            counters["enrich_failed"] = counters.get("enrich_failed", 0) + 1
+        return lead
+
+
+def resolve_stage(leads, resolver: LeadResolver, on_duplicate=None):
+    # Duplicates are merged into the lead seen first and go no further, so
+    # they are never enriched or stored on their own. Leads that come out
+    # must be passed to resolver.release() once they leave the later stages.
+    for lead in leads:
+        canonical, is_new = resolver.resolve(lead)
+        if is_new:
+            yield canonical
+        elif on_duplicate:
+            on_duplicate(lead)
+
+
+def enrich_stage(leads, cfg: dict, known=None, counters: dict | None = None):
+    enr = cfg.get("enrichment", {})
+    if not enr.get("fetch_website_for_email"):
+        for lead in leads:
+            lead.website = normalize_website(lead.website)
+            yield lead
+        return
+
+    workers = max(1, int(enr.get("concurrency", 16)))
+    limiter = HostLimiter(int(enr.get("per_host_concurrency", 2)))
+    window = workers * 4
+    pending = deque()
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich")
+    try:
+        for lead in leads:
+            lead.website = normalize_website(lead.website)
+            if lead.email:
+                pending.append((lead, None))
+            elif known is not None and known.has_contacts(lead):
+                # The stored row already has an email and phone; enrichment
+                # could not change it.
+                if counters is not None:
+                    counters["enrich_skipped"] = counters.get("enrich_skipped", 0) + 1
+                pending.append((lead, None))
+            else:
+                if counters is not None:
+                    counters["enriched"] = counters.get("enriched", 0) + 1
+                pending.append((lead, pool.submit(enrich_lead_from_website, lead, cfg, limiter)))
+            # Emit in source order: drain the head as soon as it is done, and
+            # block on it once the window of in-flight leads is full.
+            while pending and (len(pending) >= window or pending[0][1] is None or pending[0][1].done()):
+                yield _resolve(pending.popleft(), counters)
+        while pending:
+            yield _resolve(pending.popleft(), counters)
+    finally:
+        # A consumer that stops early (cancelled run) does not wait for the
+        # websites still queued behind it.
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_pipeline(
+    cfg: dict,
+    export_path: str | None = None,
+    dry_run: bool = False,
+    resume: str | None = None,
+    force_resume: bool = False,
+    progress=None,
+    cancel=None,
+    overrides: dict | None = None,
+) -> dict:
+    # `overrides` (CLI flags, server parameters) apply on top of the config,
+    # including the stored config of a resumed run.
     store = None
     if cfg["app"].get("save_to_db", True) and not dry_run:
-        store = LeadStore(cfg["app"]["db_path"])
+        store = LeadStore.from_config(cfg)
         store.init_db()
 
+    checkpoint = None
+    if resume:
+        if not store:
+            raise ValueError("Resuming a run needs the database (no --dry-run, app.save_to_db: true).")
+        try:
+            checkpoint = RunCheckpoint.resume(store, resume, cfg, force=force_resume)
+        except Exception:
+            store.close()
+            raise
+        cfg = deep_merge(checkpoint.cfg, deepcopy(overrides or {}))
+    else:
+        cfg = deep_merge(deepcopy(cfg), deepcopy(overrides or {}))
+        if store and cfg["app"].get("checkpoints", True):
+            checkpoint = RunCheckpoint.start(store, cfg)
+
     results = []
-    total = kept = saved = 0
-
-    for lead in iter_sources(cfg):
-        total += 1
-        lead.website = normalize_website(lead.website)
-        if cfg.get("enrichment", {}).get("fetch_website_for_email") and not lead.email:
-            lead = enrich_lead_from_website(lead, cfg)
-        if not passes_filters(lead, cfg):
-            continue
-        kept += 1
-        if store:
-            store.upsert(lead)
-            saved += 1
-        results.append(lead)
+    batch = []
+    batch_size = max(1, int(cfg["app"].get("db_batch_size", 500)))
+    checkpoint_interval_s = float(cfg["app"].get("checkpoint_interval_s", 5))
+    total = kept = saved = processed = 0
+    source_stats = {}
+    resolver = LeadResolver.from_config(cfg)
+    stored = set()
+    seqs = {}
+    counters = {"enriched": 0, "enrich_skipped": 0, "enrich_failed": 0, "upsert_skipped": 0}
+    cancelled = False
+    known = store.load_known() if store and cfg["app"].get("skip_known", True) else None
+    last_commit = last_report = time.monotonic()
+    progress_interval_s = float(cfg["app"].get("progress_interval_s", 0.5))
+
+    def counted(leads):
+        nonlocal total
+        for lead in leads:
+            total += 1
+            seqs[id(lead)] = total
+            yield lead
+
+    def flush():
+        nonlocal saved, last_commit
+        if batch:
+            saved += store.upsert_many(batch)
+            batch.clear()
+        if resolver and resolver.changed:
+            # Canonical leads that picked up fields from a later duplicate
+            # after they were written. Ones still in flight are written with
+            # the merged fields when they get here.
+            changed = [lead for key, lead in resolver.changed.items() if key in stored]
+            resolver.changed.clear()
+            if known is not None:
+                changed = [lead for lead in changed if known.would_change(lead)]
+            if changed:
+                store.upsert_many(changed)
+                if known is not None:
+                    for lead in changed:
+                        known.remember(lead)
+        if checkpoint:
+            checkpoint.commit(processed)
+        last_commit = time.monotonic()
+
+    def snapshot() -> dict:
+        return {
+            "run_id": checkpoint.run_id if checkpoint else None,
+            "fetched": total,
+            "merged": resolver.merged if resolver else 0,
+            "enriched": counters["enriched"],
+            "enrich_skipped": counters["enrich_skipped"],
+            "enrich_failed": counters["enrich_failed"],
+            "kept": kept,
+            "saved": saved,
+            "upsert_skipped": counters["upsert_skipped"],
+            "sources": {name: dict(src) for name, src in source_stats.items()},
+        }
 
-    path = export_path or (cfg["app"]["export_path"] if cfg["app"].get("export_on_run") else None)
-    if path:
+    sources = iter_sources(cfg, source_stats, checkpoint, cancel)
+    leads = counted(sources)
+    if resolver:
+        leads = resolve_stage(leads, resolver, on_duplicate=lambda lead: seqs.pop(id(lead), None))
+    stages = enrich_stage(leads, cfg, known, counters)
+
+    failed = True
+    try:
+        try:
+            for lead in stages:
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    break
+                # Leads leave the stages in source order, so everything pulled
+                # before this one has been stored, filtered out or merged.
+                processed = seqs.pop(id(lead), processed)
+                if resolver:
+                    # Enrichment is done with the lead: merge the duplicates
+                    # found while it was in flight before it is stored.
+                    resolver.release(lead)
+                if passes_filters(lead, cfg):
+                    kept += 1
+                    results.append(lead)
+                    if store:
+                        stored.add(id(lead))
+                        if known is not None and not known.would_change(lead):
+                            counters["upsert_skipped"] += 1
+                        else:
+                            if known is not None:
+                                known.remember(lead)
+                            batch.append(lead)
+                if store and (
+                    len(batch) >= batch_size
+                    or (checkpoint and checkpoint.pending() and time.monotonic() - last_commit >= checkpoint_interval_s)
+                ):
+                    flush()
+                if progress and time.monotonic() - last_report >= progress_interval_s:
+                    progress(snapshot())
+                    last_report = time.monotonic()
+        finally:
+            stages.close()
+            sources.close()
+
+        # On cancel, leads still in flight are dropped; their cursors stay
+        # unsaved, so resuming the run fetches them again.
+        cancelled = cancelled or (cancel is not None and cancel.is_set())
+        if not cancelled:
+            processed = total
         if store:
-            store.export_csv(path)
-        else:
-            write_csv(path, results)
+            flush()
 
-    return {"fetched": total, "kept": kept, "saved": saved, "exported_to": path}
+        path = export_path or (cfg["app"]["export_path"] if cfg["app"].get("export_on_run") else None)
+        if path:
+            if store:
+                store.export_csv(path)
+            else:
+                write_csv(path, results)
+
+        stats = snapshot()
+        stats["exported_to"] = path
+        stats["cancelled"] = cancelled
+        if checkpoint:
+            if cancelled:
+                status = "cancelled"
+            elif any(src.get("error") for src in source_stats.values()):
+                status = "partial"
+            else:
+                status = "completed"
+            checkpoint.commit(processed, status=status, stats=stats)
+        failed = False
+        return stats
+    finally:
+        if failed and store:
+            # Keep the leads processed before the failure (and the cursors
+            # behind them); the original error is what gets raised.
+            try:
+                flush()
+                if checkpoint:
+                    checkpoint.commit(-1, status="failed", stats=snapshot())
+            except Exception as exc:
+                print(f"Could not save progress of the failed run: {exc}")
+        if store:
+            store.close()
@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .utils import ensure_parent_dir
+
+
+class RateLimiter:
+    # GCRA token bucket whose state lives in SQLite, so every thread and every
+    # process sharing the cache directory draws from the same bucket.
+    def __init__(self, path: str, name: str, rate_per_s: float, burst: int = 1):
+        self.path = path
+        self.name = name
+        self.interval = 1.0 / float(rate_per_s) if rate_per_s > 0 else 0.0
+        self.burst = max(1, int(burst))
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        self._con = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._con.execute("PRAGMA journal_mode = wal")
+        self._con.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def _reserve(self) -> float:
+        with self._lock:
+            con = self._con
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                row = con.execute("SELECT tat FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                now = time.time()
+                tat = max(row[0] if row else now, now)
+                wait = max(0.0, tat - (self.burst - 1) * self.interval - now)
+                con.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tat) VALUES (?, ?)",
+                    (self.name, tat + self.interval),
+                )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+
+_limiters: dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(cfg: dict, name: str, rate_per_s: float, burst: int = 1) -> RateLimiter:
+    path = str(Path(cfg["app"].get("cache_dir", "data/cache")) / "ratelimit.db")
+    key = (path, name, float(rate_per_s), int(burst))
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(path, name, rate_per_s, burst)
+            _limiters[key] = limiter
+        return limiter
@@ -1,13 +1,39 @@
 from flask import Flask, Response, jsonify, request
-from pathlib import Path
-import yaml
+import json
+import threading
 
-from .config import load_config
-from .db import LeadStore
-from .pipeline import run_pipeline
+from .config import load_config, update_config_file
+from .db import LeadFilters, LeadStore
+from .export import check_export, export_stream, filename, media_type
+from .jobs import JobManager
 
 
 app = Flask(__name__)
+MAX_PAGE_SIZE = 1000
+MAX_SEARCH_RESULTS = 200
+_jobs: JobManager | None = None
+_jobs_lock = threading.Lock()
+_initialized_dbs: set[str] = set()
+
+
+def _read_store(cfg: dict) -> LeadStore:
+    # The schema is created once per database per process, so read endpoints
+    # do not queue behind a run's writes on every request.
+    store = LeadStore.from_config(cfg)
+    with _jobs_lock:
+        if store.path not in _initialized_dbs:
+            store.init_db()
+            _initialized_dbs.add(store.path)
+    return store
+
+
+def _job_manager(cfg: dict) -> JobManager:
+    # One pool per server process, sized by the config of the first run.
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobManager(cfg["app"].get("max_jobs", 2), cfg["app"].get("job_history", 100))
+        return _jobs
 
 
 def _persist_google_maps_settings(config_path: str, gm_query: str | None, gm_cities: str | None, gm_max_results):
@@ -16,28 +42,21 @@ def _persist_google_maps_settings(config_path: str, gm_query: str | None, gm_cit
     if gm_query is None and gm_cities is None and (gm_max_results is None or gm_max_results == ""):
         return
 
-    path = Path(config_path)
-    data = {}
-    if path.exists():
-        try:
-            data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
-        except Exception:
-            data = {}
-
-    sources = data.setdefault("sources", {})
-    gm = sources.setdefault("google_maps_browser", {})
-    gm["enabled"] = True
-    if gm_query:
-        gm["query"] = gm_query
-    if gm_cities is not None:
-        gm["cities"] = [c.strip() for c in gm_cities.split(",") if c.strip()]
-    if gm_max_results is not None and gm_max_results != "":
-        try:
-            gm["max_results"] = int(gm_max_results)
-        except ValueError:
-            pass
+    def update(data):
+        sources = data.setdefault("sources", {})
+        gm = sources.setdefault("google_maps_browser", {})
+        gm["enabled"] = True
+        if gm_query:
+            gm["query"] = gm_query
+        if gm_cities is not None:
+            gm["cities"] = [c.strip() for c in gm_cities.split(",") if c.strip()]
+        if gm_max_results is not None and gm_max_results != "":
+            try:
+                gm["max_results"] = int(gm_max_results)
+            except ValueError:
+                pass
 
-    path.write_text(yaml.safe_dump(data, sort_keys=False), encoding="utf-8")
+    update_config_file(config_path, update)
 
 
 @app.get("/")
@@ -188,7 +207,9 @@ def index():
         </div>
         <div class="btns">
           <button id="run_btn">Run pipeline</button>
+          <button id="cancel_btn" class="secondary" disabled>Cancel run</button>
           <button id="export_btn" class="secondary">Export from DB</button>
+          <button id="leads_btn" class="secondary">Browse leads</button>
           <button id="clear_btn" class="secondary">Clear output</button>
         </div>
         <pre id="output">Ready.</pre>
@@ -203,6 +224,10 @@ def index():
       const gmMax = document.getElementById("gm_max");
       const noEnrich = document.getElementById("no_enrich");
       const dryRun = document.getElementById("dry_run");
+      const cancelBtn = document.getElementById("cancel_btn");
+      let currentJob = null;
+      let events = null;
+      let leadsCursor = null;
 
       function log(message) {
         output.textContent = message;
@@ -219,8 +244,33 @@ def index():
         return params.toString();
       }
 
+      function watchJob(jobId) {
+        if (events) {
+          events.close();
+        }
+        currentJob = jobId;
+        cancelBtn.disabled = false;
+        events = new EventSource(`/jobs/${jobId}/events`);
+        const show = (e) => log(JSON.stringify(JSON.parse(e.data), null, 2));
+        events.addEventListener("progress", show);
+        events.addEventListener("done", (e) => {
+          show(e);
+          events.close();
+          events = null;
+          currentJob = null;
+          cancelBtn.disabled = true;
+        });
+      }
+
+      cancelBtn.addEventListener("click", async () => {
+        if (!currentJob) {
+          return;
+        }
+        await fetch(`/jobs/${currentJob}/cancel`, { method: "POST" });
+      });
+
       document.getElementById("run_btn").addEventListener("click", async () => {
-        log("Running...");
+        log("Queued...");
         const params = buildParams({
           config_path: cfg.value || "config.yaml",
           export: exp.value || "",
@@ -234,6 +284,9 @@ def index():
           const res = await fetch(`/run?${params}`, { method: "POST" });
           const data = await res.json();
           log(JSON.stringify(data, null, 2));
+          if (data.job_id) {
+            watchJob(data.job_id);
+          }
         } catch (err) {
           log(`Error: ${err}`);
         }
@@ -254,7 +307,25 @@ def index():
         }
       });
 
+      // Each click shows the next page; the last page starts over.
+      document.getElementById("leads_btn").addEventListener("click", async () => {
+        const params = buildParams({
+          config_path: cfg.value || "config.yaml",
+          limit: 50,
+          cursor: leadsCursor || "",
+        });
+        try {
+          const res = await fetch(`/leads?${params}`);
+          const data = await res.json();
+          leadsCursor = data.next_cursor || null;
+          log(JSON.stringify(data, null, 2));
+        } catch (err) {
+          log(`Error: ${err}`);
+        }
+      });
+
       document.getElementById("clear_btn").addEventListener("click", () => {
+        leadsCursor = null;
         log("Ready.");
       });
     </script>
@@ -286,12 +357,15 @@ def run():
         gm_query = request.args.get("gm_query") or None
         gm_cities = request.args.get("gm_cities") or None
         gm_max_results = request.args.get("gm_max_results")
+        resume = request.args.get("resume") or None
 
         cfg = load_config(config_path)
+        # Passed to the pipeline separately so they also apply to a resumed run.
+        overrides = {}
         if no_enrich:
-            cfg["enrichment"]["fetch_website_for_email"] = False
+            overrides["enrichment"] = {"fetch_website_for_email": False}
         if gm_query or gm_cities or gm_max_results is not None:
-            gm = cfg.setdefault("sources", {}).setdefault("google_maps_browser", {})
+            gm = overrides.setdefault("sources", {}).setdefault("google_maps_browser", {})
             gm["enabled"] = True
             if gm_query:
                 gm["query"] = gm_query
@@ -301,12 +375,138 @@ def run():
             if gm_max_results is not None and gm_max_results != "":
                 gm["max_results"] = int(gm_max_results)
 
-        _persist_google_maps_settings(config_path, gm_query, gm_cities, gm_max_results)
+        if not resume:
+            _persist_google_maps_settings(config_path, gm_query, gm_cities, gm_max_results)
+
+        params = {key: value for key, value in request.args.items()}
+        job = _job_manager(cfg).submit(
+            cfg, params, export_path=export, dry_run=dry_run, resume=resume, overrides=overrides
+        )
+        return jsonify(
+            {
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            }
+        ), 202
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@app.get("/jobs")
+def list_jobs():
+    jobs = _jobs.list() if _jobs else []
+    return jsonify([job.to_dict() for job in jobs])
+
+
+@app.get("/jobs/<job_id>")
+def get_job(job_id):
+    job = _jobs.get(job_id) if _jobs else None
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.post("/jobs/<job_id>/cancel")
+def cancel_job(job_id):
+    job = _jobs.cancel(job_id) if _jobs else None
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.get("/jobs/<job_id>/events")
+def job_events(job_id):
+    job = _jobs.get(job_id) if _jobs else None
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+
+    def stream():
+        sent = -1
+        while True:
+            version = job.version
+            if version != sent:
+                event = "done" if job.finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                sent = version
+                if event == "done":
+                    return
+            elif job.wait_for_change(sent, timeout=15) == sent:
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/leads")
+def list_leads():
+    try:
+        filters = LeadFilters.from_params(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    limit = request.args.get("limit", "100")
+    limit = int(limit) if limit.isdigit() else 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be between 1 and {MAX_PAGE_SIZE}."}), 400
+    try:
+        cfg = load_config(request.args.get("config_path", "config.yaml"))
+        with _read_store(cfg) as store:
+            leads, next_cursor = store.query_leads(filters, limit=limit, cursor=request.args.get("cursor") or None)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    return jsonify({"leads": leads, "next_cursor": next_cursor, "filters": filters.to_dict(), "limit": limit})
+
+
+@app.get("/search")
+def search_leads():
+    limit = request.args.get("limit", "20")
+    limit = int(limit) if limit.isdigit() else 0
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        return jsonify({"error": f"'limit' must be between 1 and {MAX_SEARCH_RESULTS}."}), 400
+    query = request.args.get("q", "")
+    try:
+        cfg = load_config(request.args.get("config_path", "config.yaml"))
+        with _read_store(cfg) as store:
+            leads = store.search(query, limit=limit)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 501
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    return jsonify({"query": query, "leads": leads})
+
 
-        stats = run_pipeline(cfg, export_path=export, dry_run=dry_run)
-        return jsonify(stats)
+@app.get("/export.<fmt>")
+def export_file(fmt):
+    compression = request.args.get("compression") or None
+    try:
+        filters = LeadFilters.from_params(request.args)
+        check_export(fmt, compression)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 501
+    try:
+        cfg = load_config(request.args.get("config_path", "config.yaml"))
+        store = _read_store(cfg)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
+    chunk_size = int(cfg["app"].get("export_chunk_size", 5000))
+
+    def stream():
+        try:
+            yield from export_stream(store, fmt, filters, compression, chunk_size)
+        finally:
+            store.close()
+
+    return Response(
+        stream(),
+        mimetype=media_type(fmt, compression),
+        headers={"Content-Disposition": f'attachment; filename="{filename(fmt, compression)}"'},
+    )
 
 
 @app.post("/export")
@@ -317,9 +517,9 @@ def export():
             return jsonify({"error": "Missing 'out' parameter."}), 400
         config_path = request.args.get("config_path", "config.yaml")
         cfg = load_config(config_path)
-        store = LeadStore(cfg["app"]["db_path"])
-        store.init_db()
-        store.export_csv(out)
+        with LeadStore.from_config(cfg) as store:
+            store.init_db()
+            store.export_csv(out)
         return jsonify({"exported_to": out})
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
@@ -1,16 +1,16 @@
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
 
+from ..contacts import contacts_from_document
+from ..document import Document, parse_html
 from ..models import Lead
 from ..enrich import fetch_html
-from ..utils import extract_emails, extract_phones, extract_name_from_html, normalize_website
+from ..utils import normalize_website
 
 
-def _find_external_website(soup: BeautifulSoup, base_url: str) -> str | None:
+def _find_external_website(doc: Document, base_url: str) -> str | None:
     base_domain = urlparse(base_url).netloc
-    for a in soup.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
-        text = a.get_text(" ", strip=True).lower()
+    for href, text in doc.links:
+        text = text.lower()
         domain = urlparse(href).netloc
         if not domain:
             continue
@@ -19,44 +19,47 @@ def _find_external_website(soup: BeautifulSoup, base_url: str) -> str | None:
     return None
 
 
-def _lead_from_html(url: str, html: str, source: str) -> Lead | None:
-    name = extract_name_from_html(html, url)
+def _lead_from_html(url: str, doc: Document, source: str) -> Lead | None:
+    name = doc.name
     if not name:
         return None
-    emails = extract_emails(html)
-    phones = extract_phones(html)
-    soup = BeautifulSoup(html, "html.parser")
-    website = _find_external_website(soup, url) or url
+    contacts = contacts_from_document(doc)
+    website = _find_external_website(doc, url) or url
     return Lead(
         name=name,
-        email=emails[0] if emails else None,
-        phone=phones[0] if phones else None,
+        email=contacts.email,
+        phone=contacts.phone,
         website=normalize_website(website),
         source=source,
     )
 
 
-def crawl_directories(cfg: dict):
+def crawl_directories(cfg: dict, checkpoint=None):
     src = cfg["sources"]["directories"]
     seeds = src.get("seed_urls") or []
     selector = src.get("listing_link_selector") or ""
     max_pages = int(src.get("max_business_pages", 50))
+    start_seed = checkpoint.get("seed", 0) if checkpoint else 0
+    start_link = checkpoint.get("link", 0) if checkpoint else 0
 
-    for seed in seeds:
+    for i, seed in enumerate(seeds[start_seed:], start_seed):
+        first = start_link if i == start_seed else 0
+        if checkpoint:
+            checkpoint.save(seed=i, link=first)
         html = fetch_html(seed, cfg)
         if not html:
             continue
         if selector:
-            soup = BeautifulSoup(html, "html.parser")
-            links = [urljoin(seed, a["href"]) for a in soup.select(selector) if a.get("href")]
-            links = links[:max_pages]
+            links = parse_html(html, seed, cfg).select_links(selector)[:max_pages]
         else:
             links = [seed]
 
-        for link in links:
+        for j, link in enumerate(links[first:], first):
+            if checkpoint and j > first:
+                checkpoint.save(seed=i, link=j)
             page_html = fetch_html(link, cfg)
             if not page_html:
                 continue
-            lead = _lead_from_html(link, page_html, source="directory")
+            lead = _lead_from_html(link, parse_html(page_html, link, cfg), source="directory")
             if lead:
                 yield lead
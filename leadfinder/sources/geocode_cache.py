@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from ..json_cache import JsonCache, get_json_cache
+from ..utils import load_json
+
+
+class GeocodeCache(JsonCache):
+    def _key(self, query: str) -> str:
+        return " ".join(query.lower().split())
+
+
+def get_geocode_cache(cfg: dict) -> GeocodeCache:
+    src = cfg["sources"]["osm_overpass"]
+    cache_dir = Path(cfg["app"].get("cache_dir", "data/cache"))
+    cache = get_json_cache(
+        str(cache_dir / "geocode.db"),
+        "geocode",
+        ttl_s=src.get("geocode_ttl_s", 30 * 86400),
+        negative_ttl_s=src.get("geocode_negative_ttl_s", 86400),
+        factory=GeocodeCache,
+    )
+    legacy = load_json(str(cache_dir / "nominatim.json"))
+    if legacy:
+        cache.put_many(((q, r) for q, r in legacy.items() if r), only_if_empty=True)
+    return cache
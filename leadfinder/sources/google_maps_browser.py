@@ -1,120 +1,279 @@
-import time
+import asyncio
+import queue
+import threading
 from urllib.parse import quote_plus
 
+from ..checkpoint import SourceIncomplete
 from ..models import Lead
 from ..utils import normalize_website
 
 
-def _safe_text(locator, timeout_ms: int = 1000) -> str:
+_DONE = object()
+
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+# Raster/vector map tiles, satellite imagery and Street View thumbnails.
+BLOCKED_URL_PARTS = ("/maps/vt", "/maps/rt", "khms", "/kh/v=", "streetviewpixels")
+
+
+async def _safe_text(locator, timeout_ms: int = 1000) -> str:
     try:
-        return (locator.first.inner_text(timeout=timeout_ms) or "").strip()
+        return (await locator.first.inner_text(timeout=timeout_ms) or "").strip()
     except Exception:
         return ""
 
 
-def _safe_attr(locator, attr: str, timeout_ms: int = 1000) -> str:
+async def _safe_attr(locator, attr: str, timeout_ms: int = 1000) -> str:
     try:
-        return (locator.first.get_attribute(attr, timeout=timeout_ms) or "").strip()
+        return (await locator.first.get_attribute(attr, timeout=timeout_ms) or "").strip()
     except Exception:
         return ""
 
 
-def crawl_google_maps(cfg: dict):
-    src = cfg.get("sources", {}).get("google_maps_browser", {})
-    if not src.get("enabled"):
-        return
+async def _block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(p in request.url for p in BLOCKED_URL_PARTS):
+        await route.abort()
+    else:
+        await route.continue_()
 
-    query = (src.get("query") or "").strip()
-    cities = [c for c in (src.get("cities") or []) if c]
-    max_results = int(src.get("max_results", 40))
-    headless = bool(src.get("headless", True))
-    slow_mo_ms = int(src.get("slow_mo_ms", 0))
-    wait_after_search_ms = int(src.get("wait_after_search_ms", 2000))
-    result_click_delay_s = float(src.get("result_click_delay_s", 0.8))
 
-    if not query:
-        print("Google Maps Browser: query is empty.")
+async def _wait_for_details(page, name, opts) -> None:
+    if opts["event_driven_waits"]:
+        try:
+            # Exact match: the previous listing's heading may contain this name
+            # ("Cafe" vs "Cafe Central") and would end the wait too early.
+            await page.wait_for_function(
+                "name => Array.from(document.querySelectorAll('h1'))"
+                ".some(h => h.textContent.replace(/\\s+/g, ' ').trim() === name)",
+                arg=" ".join(name.split()),
+                timeout=opts["details_timeout_ms"],
+            )
+            return
+        except Exception:
+            pass
+    if opts["result_click_delay_s"]:
+        await asyncio.sleep(opts["result_click_delay_s"])
+
+
+async def _wait_for_more_results(page, count, opts) -> None:
+    if opts["event_driven_waits"]:
+        try:
+            await page.wait_for_function(
+                "n => document.querySelectorAll(\"div[role='article']\").length > n",
+                arg=count,
+                timeout=opts["details_timeout_ms"],
+            )
+        except Exception:
+            pass
         return
+    await asyncio.sleep(1.0)
 
-    from playwright.sync_api import sync_playwright
 
-    targets = cities or [None]
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless, slow_mo=slow_mo_ms)
-        page = browser.new_page()
+async def _scrape_city(page, city, opts, emit, stop, start=0):
+    query = opts["query"]
+    q = f"{query} {city}".strip() if city else query
+    url = f"https://www.google.com/maps/search/?api=1&query={quote_plus(q)}"
+    await page.goto(url, wait_until="domcontentloaded")
+
+    try:
+        await page.wait_for_selector("div[role='article']", timeout=15000)
+    except Exception:
+        print(f"Google Maps Browser: no results list found for {q!r}.")
+        return
+
+    if opts["wait_after_search_ms"] and not opts["event_driven_waits"]:
+        await asyncio.sleep(opts["wait_after_search_ms"] / 1000.0)
 
-        for city in targets:
-            q = f"{query} {city}".strip() if city else query
-            url = f"https://www.google.com/maps/search/?api=1&query={quote_plus(q)}"
-            page.goto(url, wait_until="domcontentloaded")
+    seen_names = set()
+    idx = start
 
-            try:
-                page.wait_for_selector("div[role='article']", timeout=15000)
-            except Exception:
-                print("Google Maps Browser: no results list found.")
+    while idx < opts["max_results"] and not stop.is_set():
+        items = page.locator("div[role='article']")
+        count = await items.count()
+        if idx >= count:
+            feed = page.locator("div[role='feed']")
+            if await feed.count():
+                try:
+                    await feed.evaluate("el => el.scrollBy(0, el.scrollHeight)")
+                except Exception:
+                    break
+                await _wait_for_more_results(page, count, opts)
+                if await items.count() == count:
+                    break
                 continue
+            break
 
-            if wait_after_search_ms:
-                time.sleep(wait_after_search_ms / 1000.0)
-
-            seen_names = set()
-            idx = 0
-
-            while idx < max_results:
-                items = page.locator("div[role='article']")
-                count = items.count()
-                if idx >= count:
-                    feed = page.locator("div[role='feed']")
-                    if feed.count():
-                        try:
-                            feed.evaluate("el => el.scrollBy(0, el.scrollHeight)")
-                        except Exception:
-                            break
-                        time.sleep(1.0)
-                        if items.count() == count:
-                            break
-                        continue
-                    break
+        item = items.nth(idx)
+        name = await _safe_attr(item, "aria-label") or await _safe_text(item.locator("div[role='heading']"))
+        if not name or name in seen_names:
+            idx += 1
+            continue
+        seen_names.add(name)
 
-                item = items.nth(idx)
-                name = _safe_attr(item, "aria-label") or _safe_text(item.locator("div[role='heading']"))
-                if not name or name in seen_names:
-                    idx += 1
-                    continue
-                seen_names.add(name)
+        try:
+            await item.click(timeout=2000)
+        except Exception:
+            idx += 1
+            continue
+
+        await _wait_for_details(page, name, opts)
+
+        address = await _safe_text(page.locator("[data-item-id='address']"))
+        phone = await _safe_text(page.locator("[data-item-id^='phone']"))
+
+        website = await _safe_attr(page.locator("a[data-item-id='authority']"), "href")
+        if not website:
+            website = await _safe_text(page.locator("[data-item-id='authority']"))
+
+        lead_city = city
+        if address and not lead_city:
+            parts = [p.strip() for p in address.split(",") if p.strip()]
+            if len(parts) >= 2:
+                lead_city = parts[-2]
 
+        emit(
+            Lead(
+                name=name,
+                phone=phone or None,
+                website=normalize_website(website) if website else None,
+                city=lead_city,
+                source="google_maps_browser",
+                category="",
+                raw={"query": q, "address": address},
+            )
+        )
+
+        idx += 1
+        emit(("progress", city, idx))
+
+
+async def _context_worker(browser, cities, opts, emit, stop):
+    context = await browser.new_context()
+    if opts["block_resources"]:
+        await context.route("**/*", _block_heavy_resources)
+    page = await context.new_page()
+    try:
+        while not stop.is_set():
+            try:
+                city, start = cities.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                await _scrape_city(page, city, opts, emit, stop, start)
+                if not stop.is_set():
+                    emit(("city_done", city))
+            except Exception as exc:
+                print(f"Google Maps Browser: {city or opts['query']!r} failed: {exc}")
+                emit(("city_failed", city, f"{type(exc).__name__}: {exc}"))
+                # The page may be unusable after a crash or failed navigation.
+                # If the context itself is gone, opening a new page raises and
+                # stops the source.
                 try:
-                    item.click(timeout=2000)
+                    await page.close()
                 except Exception:
-                    idx += 1
-                    continue
+                    pass
+                page = await context.new_page()
+    finally:
+        await context.close()
 
-                if result_click_delay_s:
-                    time.sleep(result_click_delay_s)
 
-                address = _safe_text(page.locator("[data-item-id='address']"))
-                phone = _safe_text(page.locator("[data-item-id^='phone']"))
+async def _crawl(opts, targets, emit, stop):
+    from playwright.async_api import async_playwright
 
-                website = _safe_attr(page.locator("a[data-item-id='authority']"), "href")
-                if not website:
-                    website = _safe_text(page.locator("[data-item-id='authority']"))
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=opts["headless"], slow_mo=opts["slow_mo_ms"])
+        try:
+            cities = asyncio.Queue()
+            for target in targets:
+                cities.put_nowait(target)
+            workers = max(1, min(opts["contexts"], len(targets)))
+            await asyncio.gather(*(_context_worker(browser, cities, opts, emit, stop) for _ in range(workers)))
+        finally:
+            await browser.close()
 
-                lead_city = city
-                if address and not lead_city:
-                    parts = [p.strip() for p in address.split(",") if p.strip()]
-                    if len(parts) >= 2:
-                        lead_city = parts[-2]
 
-                yield Lead(
-                    name=name,
-                    phone=phone or None,
-                    website=normalize_website(website) if website else None,
-                    city=lead_city,
-                    source="google_maps_browser",
-                    category="",
-                    raw={"query": q, "address": address},
-                )
+def _run_crawl(opts, targets, out, stop):
+    try:
+        asyncio.run(_crawl(opts, targets, out.put, stop))
+    except BaseException as exc:
+        out.put(exc)
+    finally:
+        out.put(_DONE)
+
+
+def crawl_google_maps(cfg: dict, checkpoint=None):
+    src = cfg.get("sources", {}).get("google_maps_browser", {})
+    if not src.get("enabled"):
+        return
 
-                idx += 1
+    opts = {
+        "query": (src.get("query") or "").strip(),
+        "max_results": int(src.get("max_results", 40)),
+        "headless": bool(src.get("headless", True)),
+        "slow_mo_ms": int(src.get("slow_mo_ms", 0)),
+        "wait_after_search_ms": int(src.get("wait_after_search_ms", 2000)),
+        "result_click_delay_s": float(src.get("result_click_delay_s", 0.8)),
+        "contexts": int(src.get("contexts", 1)),
+        "block_resources": bool(src.get("block_resources", True)),
+        "event_driven_waits": bool(src.get("event_driven_waits", True)),
+        "details_timeout_ms": int(src.get("details_timeout_ms", 5000)),
+    }
+    cities = [c for c in (src.get("cities") or []) if c]
+
+    if not opts["query"]:
+        print("Google Maps Browser: query is empty.")
+        return
+
+    # Cursor: cities finished, and how far into its results list each
+    # unfinished city got. Cities are keyed by name ("" without cities).
+    done = set(checkpoint.get("done_cities", [])) if checkpoint else set()
+    progress = dict(checkpoint.get("progress", {})) if checkpoint else {}
+    targets = [(city, progress.get(city or "", 0)) for city in cities or [None] if (city or "") not in done]
+    if not targets:
+        return
+
+    # Playwright runs on its own event loop thread with one isolated browser
+    # context per worker; leads are handed back through a thread-safe queue.
+    out = queue.Queue()
+    stop = threading.Event()
+    thread = threading.Thread(target=_run_crawl, args=(opts, targets, out, stop), name="google-maps", daemon=True)
+    thread.start()
+
+    seen = set()
+    failed = {}
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if isinstance(item, tuple):
+                kind, city = item[0], item[1] or ""
+                if kind == "progress":
+                    progress[city] = item[2]
+                elif kind == "city_failed":
+                    # Not done: the cursor keeps the city (and how far it got)
+                    # for a resume.
+                    failed[city] = item[2]
+                    continue
+                else:
+                    done.add(city)
+                    progress.pop(city, None)
+                if checkpoint:
+                    checkpoint.save(done_cities=sorted(done), progress=dict(progress))
+                continue
+            key = (item.name.strip().lower(), (item.raw.get("address") or "").strip().lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            yield item
+    finally:
+        stop.set()
 
-        browser.close()
+    if failed:
+        details = "; ".join(f"{city or opts['query']!r}: {exc}" for city, exc in failed.items())
+        raise SourceIncomplete(
+            f"Google Maps Browser: {len(failed)} of {len(targets)} cities failed ({details})",
+            skipped=sorted(failed),
+        )
@@ -1,18 +1,29 @@
 import time
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
 
+from ..http_client import get_session, http_timeout
+from ..json_cache import get_json_cache
 from ..models import Lead
+from ..ratelimit import get_rate_limiter
 
 
 TEXT_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+NEXT_PAGE_DELAY_S = 2.0
 
 
 def _request(url: str, params: dict, cfg: dict) -> dict:
-    delay = cfg["app"].get("request_delay_s", 0)
-    if delay:
-        time.sleep(delay)
-    resp = requests.get(url, params=params, timeout=cfg["app"].get("request_timeout_s", 15))
+    gp = cfg["sources"]["google_places"]
+    qps = float(gp.get("qps", 0))
+    if qps > 0:
+        get_rate_limiter(cfg, "google_places", qps, int(gp.get("qps_burst", 1))).acquire()
+    else:
+        delay = cfg["app"].get("request_delay_s", 0)
+        if delay:
+            time.sleep(delay)
+    resp = get_session(cfg).get(url, params=params, timeout=http_timeout(cfg, 15))
     if not resp.ok:
         return {}
     return resp.json() or {}
@@ -41,19 +52,68 @@ def _parse_city_from_address(address: str | None) -> str | None:
     return None
 
 
-def _get_details(place_id: str, api_key: str, cfg: dict) -> dict:
+def _details_cache(cfg: dict):
+    ttl_s = float(cfg["sources"]["google_places"].get("details_cache_ttl_s", 0))
+    if ttl_s <= 0:
+        return None
+    path = Path(cfg["app"].get("cache_dir", "data/cache")) / "places.db"
+    return get_json_cache(str(path), "details", ttl_s)
+
+
+def _get_details(place_id: str, api_key: str, cfg: dict, cache=None) -> dict:
     if not place_id:
         return {}
+    if cache:
+        result, hit = cache.get(place_id)
+        if hit:
+            return result or {}
     params = {
         "place_id": place_id,
         "key": api_key,
         "fields": "name,formatted_phone_number,website,types,formatted_address,address_components",
     }
     data = _request(DETAILS_URL, params, cfg)
-    return data.get("result", {}) if isinstance(data, dict) else {}
-
-
-def search_google_places(cfg: dict):
+    result = data.get("result", {}) if isinstance(data, dict) else {}
+    if cache and result and data.get("status") == "OK":
+        cache.put(place_id, result)
+    return result
+
+
+def _lead_from_result(item: dict, details: dict) -> Lead:
+    name = details.get("name") or item.get("name") or ""
+    phone = details.get("formatted_phone_number")
+    website = details.get("website")
+    types = details.get("types") or item.get("types") or []
+    address = details.get("formatted_address") or item.get("formatted_address")
+    city_name = _parse_city(details.get("address_components")) or _parse_city_from_address(address)
+
+    return Lead(
+        name=name,
+        phone=phone,
+        website=website,
+        city=city_name,
+        source="google_places",
+        category=",".join(types),
+        raw={"text_search": item, "details": details},
+    )
+
+
+def _drain(pending: deque, deadline: float | None = None, block: bool = False):
+    while pending:
+        item, fut = pending[0]
+        if fut is not None and not fut.done():
+            if deadline is not None:
+                try:
+                    fut.result(timeout=max(0.0, deadline - time.time()))
+                except FutureTimeoutError:
+                    return
+            elif not block:
+                return
+        pending.popleft()
+        yield _lead_from_result(item, fut.result() if fut is not None else {})
+
+
+def search_google_places(cfg: dict, checkpoint=None):
     gp = cfg["sources"]["google_places"]
     api_key = gp.get("api_key") or ""
     if not api_key:
@@ -65,46 +125,62 @@ def search_google_places(cfg: dict):
     max_results = int(gp.get("max_results", 60))
     fetch_details = bool(gp.get("fetch_details", True))
 
+    workers = max(1, int(gp.get("details_workers", 8)))
+    cache = _details_cache(cfg) if fetch_details else None
+
+    # Details lookups run on a worker pool while text-search pagination
+    # continues; leads are still emitted in text-search order.
+    pending = deque()
     targets = cities or [None]
-    for city in targets:
-        q = f"{query} in {city}" if city else query
-        fetched = 0
-        page_token = None
-
-        while True:
-            params = {"query": q, "key": api_key}
-            if page_token:
-                params["pagetoken"] = page_token
-            data = _request(TEXT_SEARCH_URL, params, cfg)
-            results = data.get("results", []) if isinstance(data, dict) else []
-
-            for item in results:
+    start = checkpoint.get("city", 0) if checkpoint else 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="places") as pool:
+        for i, city in enumerate(targets[start:], start):
+            q = f"{query} in {city}" if city else query
+            fetched = 0
+            page_token = None
+            if checkpoint and i == start:
+                fetched = checkpoint.get("fetched", 0)
+                page_token = checkpoint.get("page_token")
+            resumed_token = page_token
+
+            while True:
+                params = {"query": q, "key": api_key}
+                if page_token:
+                    params["pagetoken"] = page_token
+                data = _request(TEXT_SEARCH_URL, params, cfg)
+                if resumed_token and isinstance(data, dict) and data.get("status") == "INVALID_REQUEST":
+                    # The saved page token expired; start the city over.
+                    resumed_token = page_token = None
+                    fetched = 0
+                    continue
+                resumed_token = None
+                results = data.get("results", []) if isinstance(data, dict) else []
+
+                for item in results:
+                    if fetched >= max_results:
+                        break
+                    fut = pool.submit(_get_details, item.get("place_id"), api_key, cfg, cache) if fetch_details else None
+                    pending.append((item, fut))
+                    fetched += 1
+                yield from _drain(pending)
+
                 if fetched >= max_results:
                     break
-                place_id = item.get("place_id")
-                details = _get_details(place_id, api_key, cfg) if fetch_details else {}
-
-                name = details.get("name") or item.get("name") or ""
-                phone = details.get("formatted_phone_number")
-                website = details.get("website")
-                types = details.get("types") or item.get("types") or []
-                address = details.get("formatted_address") or item.get("formatted_address")
-                city_name = _parse_city(details.get("address_components")) or _parse_city_from_address(address)
-
-                yield Lead(
-                    name=name,
-                    phone=phone,
-                    website=website,
-                    city=city_name,
-                    source="google_places",
-                    category=",".join(types),
-                    raw={"text_search": item, "details": details},
-                )
-                fetched += 1
-
-            if fetched >= max_results:
-                break
-            page_token = data.get("next_page_token") if isinstance(data, dict) else None
-            if not page_token:
-                break
-            time.sleep(2.0)
+                page_token = data.get("next_page_token") if isinstance(data, dict) else None
+                if not page_token:
+                    break
+                # next_page_token only becomes valid after a short delay; spend
+                # it emitting details that finish in the meantime.
+                deadline = time.time() + NEXT_PAGE_DELAY_S
+                yield from _drain(pending, deadline=deadline)
+                if checkpoint and not pending:
+                    checkpoint.save(city=i, page_token=page_token, fetched=fetched)
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    time.sleep(remaining)
+
+            if checkpoint:
+                yield from _drain(pending, block=True)
+                checkpoint.save(city=i + 1)
+
+        yield from _drain(pending, block=True)
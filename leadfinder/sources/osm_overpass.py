@@ -1,9 +1,20 @@
+import queue
+import threading
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 import requests
 
+from ..checkpoint import SourceIncomplete
+from ..concurrency import put_until_stopped
+from ..http_client import get_session, http_timeout
 from ..models import Lead
-from ..utils import extract_emails, extract_phones, normalize_website, load_json, save_json
+from ..ratelimit import get_rate_limiter
+from ..utils import extract_emails, extract_phones, normalize_website
+from .geocode_cache import get_geocode_cache
+from .overpass_cache import get_overpass_cache
+from .overpass_stream import ElementStream
+from .overpass_tiles import plan_tiles, remaining_tiles
 
 
 CATEGORY_KEYS = [
@@ -24,7 +35,21 @@ PHONE_KEYS = ["contact:phone", "phone", "contact:mobile", "mobile"]
 WEBSITE_KEYS = ["contact:website", "website", "contact:url", "url"]
 CITY_KEYS = ["addr:city", "addr:town", "addr:village", "addr:municipality", "addr:county", "addr:place"]
 
-_last_geocode_ts = 0.0
+SPLITTABLE_STATUSES = {504}
+REJECTED_STATUSES = {400, 413, 414}
+# Rate limited: the same batch is retried after a pause, never split, since
+# smaller queries would only mean more requests.
+RATE_LIMITED_STATUSES = {429}
+SPLITTABLE_REMARKS = ("timed out", "out of memory")
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class OverpassError(Exception):
+    def __init__(self, message: str, splittable: bool = False, status: int = 0, retry_after: float | None = None):
+        super().__init__(message)
+        self.splittable = splittable
+        self.status = status
+        self.retry_after = retry_after
 
 
 def _parse_tag_filters(raw):
@@ -51,19 +76,17 @@ def _filter_to_overpass(tag):
     return f'["{key}"="{value}"]'
 
 
-def _build_query(tag_filters, bbox, timeout_s):
-    south, west, north, east = bbox
-    bbox_str = f"{south},{west},{north},{east}"
+def _build_query(tag_filters, bboxes, timeout_s, limit=0):
+    filters = [_filter_to_overpass(tag) for tag in tag_filters]
     parts = []
-    for tag in tag_filters:
-        filt = _filter_to_overpass(tag)
-        parts.append(f"node{filt}({bbox_str});")
-        parts.append(f"way{filt}({bbox_str});")
-        parts.append(f"relation{filt}({bbox_str});")
+    for south, west, north, east in bboxes:
+        bbox_str = f"{south},{west},{north},{east}"
+        parts.extend(f"nwr{filt}({bbox_str});" for filt in filters)
     if not parts:
         return ""
     body = "\n".join(parts)
-    return f"[out:json][timeout:{int(timeout_s)}];({body});out center tags;"
+    out = f"out center tags {int(limit)};" if limit else "out center tags;"
+    return f"[out:json][timeout:{int(timeout_s)}];({body});{out}"
 
 
 def _log(cfg, message: str) -> None:
@@ -71,29 +94,216 @@ def _log(cfg, message: str) -> None:
         print(message)
 
 
-def _request_overpass(query, cfg):
-    if not query:
-        return {}
-    delay = float(cfg["app"].get("request_delay_s", 0))
-    if delay:
-        time.sleep(delay)
-    url = cfg["sources"]["osm_overpass"].get("overpass_url")
-    timeout = float(cfg["app"].get("request_timeout_s", 20))
-    headers = {"User-Agent": cfg["app"].get("user_agent", "LeadFinderBot/0.1")}
-    try:
-        resp = requests.post(url, data={"data": query}, headers=headers, timeout=timeout)
-    except requests.RequestException as exc:
-        _log(cfg, f"OSM Overpass request failed: {exc}")
-        return {}
-    if not resp.ok:
-        snippet = (resp.text or "")[:200].replace("\n", " ")
-        _log(cfg, f"OSM Overpass HTTP {resp.status_code}: {snippet}")
-        return {}
-    try:
-        return resp.json()
-    except ValueError:
-        _log(cfg, "OSM Overpass: invalid JSON response.")
-        return {}
+def _parse_elements(chunks):
+    stream = ElementStream(chunks)
+    try:
+        yield from stream
+    except ValueError as exc:
+        raise OverpassError(f"OSM Overpass: invalid JSON response ({exc}).", splittable=True) from exc
+    remark = str(stream.trailer.get("remark") or "")
+    if remark:
+        raise OverpassError(
+            f"OSM Overpass remark: {remark}",
+            splittable=any(r in remark.lower() for r in SPLITTABLE_REMARKS),
+        )
+
+
+def _retry_after(resp):
+    value = (resp.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _tee(chunks, sink):
+    for chunk in chunks:
+        sink.write(chunk)
+        yield chunk
+
+
+def _stream_overpass(query, cfg):
+    if not query:
+        return
+    url = cfg["sources"]["osm_overpass"].get("overpass_url")
+    cache = get_overpass_cache(cfg)
+    cached = cache.open(url, query) if cache else None
+    if cached is not None:
+        with cached:
+            yield from _parse_elements(iter(lambda: cached.read(STREAM_CHUNK_BYTES), b""))
+        return
+
+    delay = float(cfg["app"].get("request_delay_s", 0))
+    if delay:
+        time.sleep(delay)
+    try:
+        resp = get_session(cfg).post(url, data={"data": query}, timeout=http_timeout(cfg), stream=True)
+    except requests.Timeout as exc:
+        raise OverpassError(f"OSM Overpass request timed out: {exc}", splittable=True) from exc
+    except requests.RequestException as exc:
+        raise OverpassError(f"OSM Overpass request failed: {exc}") from exc
+
+    with resp:
+        if not resp.ok:
+            snippet = (resp.text or "")[:200].replace("\n", " ")
+            raise OverpassError(
+                f"OSM Overpass HTTP {resp.status_code}: {snippet}",
+                splittable=resp.status_code in SPLITTABLE_STATUSES,
+                status=resp.status_code,
+                retry_after=_retry_after(resp),
+            )
+        # The body is spooled to the cache file while it is parsed, so the
+        # first elements are yielded before the download finishes.
+        spool = cache.writer(url, query) if cache else None
+        chunks = resp.iter_content(STREAM_CHUNK_BYTES)
+        try:
+            yield from _parse_elements(_tee(chunks, spool) if spool else chunks)
+        except requests.RequestException as exc:
+            if spool:
+                spool.discard()
+            raise OverpassError(f"OSM Overpass download failed: {exc}", splittable=True) from exc
+        except BaseException:
+            if spool:
+                spool.discard()
+            raise
+        if spool:
+            spool.commit()
+
+
+def _element_point(el):
+    if "lat" in el and "lon" in el:
+        return el["lat"], el["lon"]
+    center = el.get("center") or {}
+    if "lat" in center and "lon" in center:
+        return center["lat"], center["lon"]
+    return None
+
+
+def _owner(batch, el):
+    if len(batch) > 1:
+        point = _element_point(el) if isinstance(el, dict) else None
+        if point:
+            for tile in batch:
+                if tile.contains(*point):
+                    return tile
+    return batch[0]
+
+
+def _split_batch(batch, min_tile_deg):
+    if len(batch) > 1:
+        mid = len(batch) // 2
+        return [batch[:mid], batch[mid:]]
+    tile = batch[0]
+    if tile.can_split(min_tile_deg):
+        return [tile.split()]
+    return []
+
+
+def _fetch_batch(batch, tag_filters, cfg, timeout_s, limit, out, stop):
+    if stop.is_set():
+        # The consumer has what it needs; do not spend a query on this batch.
+        return
+    count = 0
+    error = OverpassError("OSM Overpass: query did not complete.")
+    try:
+        src = cfg["sources"]["osm_overpass"]
+        retries = max(0, int(src.get("rate_limit_retries", 3)))
+        backoff_s = float(src.get("rate_limit_backoff_s", 10))
+        query = _build_query(tag_filters, [t.bbox for t in batch], timeout_s, limit)
+        attempt = 0
+        while True:
+            count = 0
+            try:
+                for el in _stream_overpass(query, cfg):
+                    count += 1
+                    if not put_until_stopped(out, ("element", batch, el), stop):
+                        return
+                error = None
+                return
+            except OverpassError as exc:
+                if exc.status in RATE_LIMITED_STATUSES and not count and attempt < retries:
+                    wait_s = exc.retry_after if exc.retry_after is not None else backoff_s * 2 ** attempt
+                    attempt += 1
+                    _log(cfg, f"{exc}; retry {attempt}/{retries} in {wait_s:.1f}s")
+                    if stop.wait(wait_s):
+                        return
+                    continue
+                error = exc
+                return
+    except Exception as exc:
+        error = OverpassError(f"OSM Overpass: {exc}")
+    finally:
+        # Posted whatever happened above (a bad config value included), or
+        # _iter_tiles would wait for this batch forever.
+        put_until_stopped(out, ("done", batch, count, error), stop)
+
+
+def _iter_tiles(tiles, tag_filters, cfg, on_done=None, skipped=None):
+    src = cfg["sources"]["osm_overpass"]
+    timeout_s = float(src.get("overpass_timeout_s", 25))
+    limit = int(src.get("max_elements_per_tile", 0))
+    min_tile_deg = float(src.get("min_tile_deg", 0.01))
+    workers = max(1, int(src.get("tile_workers", 2)))
+    per_query = max(1, int(src.get("max_tiles_per_query", 16)))
+    batches = [tiles[i:i + per_query] for i in range(0, len(tiles), per_query)]
+
+    # Workers push elements through a bounded queue, so memory stays flat no
+    # matter how large a single response is.
+    out = queue.Queue(maxsize=1000)
+    stop = threading.Event()
+    pending = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="overpass") as pool:
+        def submit(batch):
+            nonlocal pending
+            pending += 1
+            pool.submit(_fetch_batch, batch, tag_filters, cfg, timeout_s, limit, out, stop)
+
+        try:
+            for batch in batches:
+                submit(batch)
+            while pending:
+                kind, batch, *rest = out.get()
+                if kind == "element":
+                    yield _owner(batch, rest[0]), rest[0]
+                    continue
+
+                pending -= 1
+                count, exc = rest
+                bboxes = [t.bbox for t in batch]
+                if exc is not None:
+                    rejected = len(batch) > 1 and exc.status in REJECTED_STATUSES
+                    parts = _split_batch(batch, min_tile_deg) if exc.splittable or rejected else []
+                    if parts:
+                        _log(cfg, f"{exc}; splitting {bboxes}")
+                        for part in parts:
+                            submit(part)
+                    else:
+                        print(f"{exc} (tiles {bboxes} skipped)")
+                        if skipped is not None:
+                            skipped.extend(batch)
+                    continue
+                if limit and count >= limit:
+                    parts = _split_batch(batch, min_tile_deg)
+                    if parts:
+                        _log(cfg, f"OSM Overpass: {bboxes} hit {limit} elements; splitting")
+                        for part in parts:
+                            submit(part)
+                        continue
+                # Every element of the batch has been yielded by now.
+                if on_done:
+                    on_done(batch)
+                if not count:
+                    _log(cfg, f"OSM Overpass: 0 elements for bboxes {bboxes} and filters {tag_filters}")
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
 
 
 def _parse_bbox(value):
@@ -115,35 +325,37 @@ def _parse_bbox(value):
 def _geocode_city(city, cfg, cache):
     if not city:
         return None
-    if city in cache:
-        return cache[city]
+    result, hit = cache.get(city)
+    if hit:
+        return result
 
     delay_s = float(cfg["sources"]["osm_overpass"].get("geocode_delay_s", 1.1))
-    global _last_geocode_ts
-    now = time.time()
-    wait = max(0.0, delay_s - (now - _last_geocode_ts))
-    if wait:
-        time.sleep(wait)
-    _last_geocode_ts = time.time()
+    get_rate_limiter(cfg, "nominatim", 1.0 / delay_s if delay_s > 0 else 0).acquire()
 
     url = cfg["sources"]["osm_overpass"].get("nominatim_url")
-    timeout = float(cfg["app"].get("request_timeout_s", 20))
-    headers = {"User-Agent": cfg["app"].get("user_agent", "LeadFinderBot/0.1")}
     params = {"format": "json", "q": city, "limit": 1, "addressdetails": 1}
 
-    resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+    # Transport errors, non-2xx responses and unreadable bodies are transient:
+    # they raise and are not cached. Only a successful answer without a usable
+    # result means the city cannot be geocoded; it is cached as negative.
+    try:
+        resp = get_session(cfg).get(url, params=params, timeout=http_timeout(cfg))
+    except requests.RequestException as exc:
+        raise OverpassError(f"Nominatim request for {city!r} failed: {exc}") from exc
     if not resp.ok:
-        return None
+        raise OverpassError(f"Nominatim HTTP {resp.status_code} for {city!r}", status=resp.status_code)
     try:
         data = resp.json()
-    except ValueError:
-        return None
+    except ValueError as exc:
+        raise OverpassError(f"Nominatim: invalid JSON response for {city!r}") from exc
     if not data:
+        cache.put(city, None)
         return None
 
     item = data[0]
     bbox = item.get("boundingbox")
     if not bbox or len(bbox) != 4:
+        cache.put(city, None)
         return None
 
     south, north, west, east = [float(x) for x in bbox]
@@ -157,7 +369,7 @@ def _geocode_city(city, cfg, cache):
         or city
     )
     result = {"bbox": [south, west, north, east], "city": city_name}
-    cache[city] = result
+    cache.put(city, result)
     return result
 
 
@@ -223,7 +435,11 @@ def _matches_name(name, tags, tokens):
     return any(tok in hay for tok in tokens)
 
 
-def search_osm_overpass(cfg):
+def _location_key(bbox) -> str:
+    return ",".join(repr(float(x)) for x in bbox)
+
+
+def search_osm_overpass(cfg, checkpoint=None):
     src = cfg.get("sources", {}).get("osm_overpass", {})
     if not src.get("enabled"):
         return
@@ -235,65 +451,113 @@ def search_osm_overpass(cfg):
 
     name_contains = [t.lower() for t in (src.get("name_contains") or []) if t]
     max_results = int(src.get("max_results", 0))
-    overpass_timeout = float(src.get("overpass_timeout_s", 25))
-
-    cache_dir = cfg.get("app", {}).get("cache_dir", "data/cache")
-    cache_path = Path(cache_dir) / "nominatim.json"
-    cache = load_json(str(cache_path))
+    max_tile_deg = float(src.get("max_tile_deg", 0))
 
     locations = []
     for bbox in src.get("bboxes") or []:
         parsed = _parse_bbox(bbox)
-        if parsed:
+        if parsed and all(loc["bbox"] != parsed for loc in locations):
             locations.append({"bbox": parsed, "city": None})
 
-    for city in src.get("cities") or []:
-        geo = _geocode_city(city, cfg, cache)
-        if geo:
+    cities = src.get("cities") or []
+    cache = get_geocode_cache(cfg) if cities else None
+    failed_cities = []
+    for city in cities:
+        try:
+            geo = _geocode_city(city, cfg, cache)
+        except OverpassError as exc:
+            # Retried on resume; the other locations are fetched meanwhile.
+            print(f"OSM Overpass: {exc}")
+            failed_cities.append(city)
+            continue
+        if not geo:
+            print(f"OSM Overpass: could not geocode city {city!r}.")
+        elif all(loc["bbox"] != geo["bbox"] for loc in locations):
+            # Locations are keyed by bbox in the cursor; one area is queried once.
             locations.append({"bbox": geo["bbox"], "city": geo["city"]})
 
-    if src.get("cities"):
-        save_json(str(cache_path), cache)
-
     if not locations:
+        if failed_cities:
+            raise SourceIncomplete(f"OSM Overpass: could not geocode {len(failed_cities)} city(ies)", skipped=failed_cities)
         print("OSM Overpass: no locations configured (cities or bboxes).")
         return
 
-    for loc in locations:
-        query = _build_query(tag_filters, loc["bbox"], overpass_timeout)
-        data = _request_overpass(query, cfg)
-        elements = data.get("elements", []) if isinstance(data, dict) else []
-        if not elements:
-            _log(
-                cfg,
-                f"OSM Overpass: 0 elements for bbox {loc['bbox']} and filters {tag_filters}",
-            )
-        fetched = 0
-
-        for el in elements:
-            if max_results and fetched >= max_results:
+    tiles = []
+    for idx, loc in enumerate(locations):
+        tiles.extend(plan_tiles(loc["bbox"], idx, max_tile_deg))
+
+    # Cursor: bboxes of the tiles whose elements have all been emitted, and
+    # counts for max_results keyed by location bbox. Both are keyed by value,
+    # so a resumed run whose locations differ (a city that failed to geocode
+    # before and works now) still skips exactly the finished work.
+    keys = [_location_key(loc["bbox"]) for loc in locations]
+    done = set()
+    fetched = [0] * len(locations)
+    if checkpoint:
+        done = {tuple(b) for b in checkpoint.get("done_tiles", [])}
+        counts = checkpoint.get("fetched") or {}
+        if isinstance(counts, dict):
+            fetched = [int(counts.get(key, 0)) for key in keys]
+        if done:
+            tiles = remaining_tiles(tiles, done, float(src.get("min_tile_deg", 0.01)))
+
+    def on_done(batch):
+        done.update(t.bbox for t in batch)
+        if checkpoint:
+            checkpoint.save(done_tiles=sorted(done), fetched=dict(zip(keys, fetched)))
+
+    seen = set()
+    skipped = []
+    stream = _iter_tiles(tiles, tag_filters, cfg, on_done, skipped)
+    for tile, el in stream:
+        if max_results and fetched[tile.loc] >= max_results:
+            if all(n >= max_results for n in fetched):
                 break
-            tags = el.get("tags", {}) if isinstance(el, dict) else {}
-            name = tags.get("name") or tags.get("operator") or tags.get("brand")
-            if not name:
-                continue
-            if not _matches_name(name, tags, name_contains):
-                continue
-
-            email = _extract_email(tags)
-            phone = _extract_phone(tags)
-            website = _extract_website(tags)
-            city = _extract_city(tags) or loc.get("city")
-            category = _extract_category(tags, tag_filters)
-
-            yield Lead(
-                name=name,
-                email=email,
-                phone=phone,
-                website=website,
-                city=city,
-                source="osm_overpass",
-                category=category,
-                raw={"osm_id": el.get("id"), "osm_type": el.get("type"), "tags": tags},
-            )
-            fetched += 1
+            continue
+        if not isinstance(el, dict):
+            continue
+        key = (el.get("type"), el.get("id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        tags = el.get("tags", {})
+        name = tags.get("name") or tags.get("operator") or tags.get("brand")
+        if not name:
+            continue
+        if not _matches_name(name, tags, name_contains):
+            continue
+
+        loc = locations[tile.loc]
+        email = _extract_email(tags)
+        phone = _extract_phone(tags)
+        website = _extract_website(tags)
+        city = _extract_city(tags) or loc.get("city")
+        category = _extract_category(tags, tag_filters)
+
+        yield Lead(
+            name=name,
+            email=email,
+            phone=phone,
+            website=website,
+            city=city,
+            source="osm_overpass",
+            category=category,
+            raw={"osm_id": el.get("id"), "osm_type": el.get("type"), "tags": tags},
+        )
+        fetched[tile.loc] += 1
+        if max_results and all(n >= max_results for n in fetched):
+            break
+    # Closing the stream as soon as every location is full cancels the
+    # batches that have not been queried yet.
+    stream.close()
+
+    # Skipped tiles of a location that is already full cost nothing; the rest
+    # stay out of the cursor and are fetched again when the run is resumed.
+    missing = [t.bbox for t in skipped if not (max_results and fetched[t.loc] >= max_results)]
+    if missing or failed_cities:
+        problems = []
+        if failed_cities:
+            problems.append(f"could not geocode {len(failed_cities)} city(ies)")
+        if missing:
+            problems.append(f"{len(missing)} tile(s) skipped after errors")
+        raise SourceIncomplete(f"OSM Overpass: {', '.join(problems)}", skipped=failed_cities + missing)
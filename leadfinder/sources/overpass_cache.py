@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+
+CACHE_MODES = {"use", "refresh", "bypass"}
+
+
+class CacheWriter:
+    def __init__(self, cache: "OverpassCache", path: Path):
+        self.cache = cache
+        self.path = path
+        self.tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        self._file = gzip.open(self.tmp, "wb", compresslevel=6)
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        self._file.close()
+        os.replace(self.tmp, self.path)
+        self.cache.evict()
+
+    def discard(self) -> None:
+        self._file.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class OverpassCache:
+    def __init__(self, directory: str, ttl_s: float, max_bytes: int, mode: str = "use"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported Overpass cache mode: {mode}")
+        self.directory = Path(directory)
+        self.ttl_s = float(ttl_s)
+        self.max_bytes = int(max_bytes)
+        self.mode = mode
+
+    @staticmethod
+    def key(url: str, query: str) -> str:
+        return hashlib.sha256(f"{url}\n{query}".encode("utf-8")).hexdigest()
+
+    def path_for(self, url: str, query: str) -> Path:
+        return self.directory / f"{self.key(url, query)}.json.gz"
+
+    def open(self, url: str, query: str):
+        if self.mode != "use":
+            return None
+        path = self.path_for(url, query)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_s:
+                return None
+            return gzip.open(path, "rb")
+        except OSError:
+            return None
+
+    def writer(self, url: str, query: str) -> CacheWriter | None:
+        if self.mode == "bypass":
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return CacheWriter(self, self.path_for(url, query))
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.json.gz"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def get_overpass_cache(cfg: dict) -> OverpassCache | None:
+    opts = cfg["sources"]["osm_overpass"].get("cache") or {}
+    mode = str(opts.get("mode", "use")).lower()
+    if mode == "bypass":
+        return None
+    directory = Path(cfg["app"].get("cache_dir", "data/cache")) / "overpass"
+    return OverpassCache(
+        str(directory),
+        ttl_s=opts.get("ttl_s", 86400),
+        max_bytes=int(float(opts.get("max_mb", 512)) * 1024 * 1024),
+        mode=mode,
+    )
@@ -0,0 +1,69 @@
+import codecs
+import json
+import re
+
+
+ELEMENTS_RE = re.compile(r'"elements"\s*:\s*\[')
+SEPARATOR_RE = re.compile(r"[\s,]*")
+
+
+# Yields the items of the top-level "elements" array as the raw JSON chunks
+# arrive. Keys after the array (Overpass puts "remark" there) end up in
+# `trailer` once iteration finishes.
+class ElementStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.trailer: dict = {}
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        text = codecs.getincrementaldecoder("utf-8")("replace")
+        buf = ""
+        state = "head"
+
+        def drain(buf, final=False):
+            nonlocal state
+            if state == "head":
+                m = ELEMENTS_RE.search(buf)
+                if not m:
+                    return [], buf
+                state = "items"
+                buf = buf[m.end():]
+            items = []
+            pos = 0
+            if state == "items":
+                while True:
+                    pos = SEPARATOR_RE.match(buf, pos).end()
+                    if pos >= len(buf):
+                        break
+                    if buf[pos] == "]":
+                        state = "tail"
+                        pos += 1
+                        break
+                    try:
+                        obj, pos = decoder.raw_decode(buf, pos)
+                    except json.JSONDecodeError:
+                        if final:
+                            raise
+                        break
+                    items.append(obj)
+            return items, buf[pos:]
+
+        for chunk in self.chunks:
+            buf += text.decode(chunk)
+            items, buf = drain(buf)
+            yield from items
+        buf += text.decode(b"", final=True)
+        items, buf = drain(buf, final=True)
+        yield from items
+
+        if state == "head":
+            doc = json.loads(buf) if buf.strip() else {}
+            self.trailer = doc if isinstance(doc, dict) else {}
+        elif state == "items":
+            raise ValueError("Truncated JSON: elements array was not closed.")
+        else:
+            rest = buf.strip()
+            if rest.startswith(","):
+                rest = rest[1:]
+            self.trailer = json.loads("{" + rest)
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Tile:
+    south: float
+    west: float
+    north: float
+    east: float
+    loc: int = 0
+    depth: int = 0
+
+    @property
+    def bbox(self) -> tuple[float, float, float, float]:
+        return (self.south, self.west, self.north, self.east)
+
+    @property
+    def size_deg(self) -> float:
+        return max(self.north - self.south, self.east - self.west)
+
+    def can_split(self, min_tile_deg: float) -> bool:
+        return self.size_deg / 2 >= min_tile_deg
+
+    def split(self) -> list["Tile"]:
+        mid_lat = (self.south + self.north) / 2
+        mid_lon = (self.west + self.east) / 2
+        depth = self.depth + 1
+        return [
+            Tile(self.south, self.west, mid_lat, mid_lon, self.loc, depth),
+            Tile(self.south, mid_lon, mid_lat, self.east, self.loc, depth),
+            Tile(mid_lat, self.west, self.north, mid_lon, self.loc, depth),
+            Tile(mid_lat, mid_lon, self.north, self.east, self.loc, depth),
+        ]
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return self.south <= lat <= self.north and self.west <= lon <= self.east
+
+
+def plan_tiles(bbox, loc: int, max_tile_deg: float) -> list[Tile]:
+    south, west, north, east = bbox
+    stack = [Tile(south, west, north, east, loc)]
+    tiles = []
+    while stack:
+        tile = stack.pop()
+        if max_tile_deg and tile.size_deg > max_tile_deg:
+            stack.extend(reversed(tile.split()))
+        else:
+            tiles.append(tile)
+    return tiles
+
+
+def remaining_tiles(tiles, done: set, min_tile_deg: float) -> list[Tile]:
+    # Drops tiles whose bbox is in `done` and re-splits tiles that were split
+    # in an earlier run, so only the quarters still missing are fetched again.
+    if not done:
+        return list(tiles)
+    stack = list(reversed(tiles))
+    out = []
+    while stack:
+        tile = stack.pop()
+        if tile.bbox in done:
+            continue
+        partly_done = any(
+            tile.south <= s and n <= tile.north and tile.west <= w and e <= tile.east
+            for s, w, n, e in done
+        )
+        if partly_done and tile.can_split(min_tile_deg):
+            stack.extend(reversed(tile.split()))
+        else:
+            out.append(tile)
+    return out
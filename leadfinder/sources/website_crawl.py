@@ -1,22 +1,26 @@
+from ..contacts import contacts_from_document
+from ..document import parse_html
 from ..models import Lead
 from ..enrich import fetch_html
-from ..utils import extract_emails, extract_phones, extract_name_from_html, normalize_website
+from ..utils import normalize_website
 
 
-def crawl_websites(cfg: dict):
+def crawl_websites(cfg: dict, checkpoint=None):
     src = cfg["sources"]["websites"]
     seeds = src.get("seed_urls") or []
-    for url in seeds:
+    start = checkpoint.get("seed", 0) if checkpoint else 0
+    for i, url in enumerate(seeds[start:], start):
+        if checkpoint:
+            checkpoint.save(seed=i)
         html = fetch_html(url, cfg)
         if not html:
             continue
-        name = extract_name_from_html(html, url)
-        emails = extract_emails(html)
-        phones = extract_phones(html)
+        doc = parse_html(html, url, cfg)
+        contacts = contacts_from_document(doc)
         yield Lead(
-            name=name or normalize_website(url),
-            email=emails[0] if emails else None,
-            phone=phones[0] if phones else None,
+            name=doc.name or normalize_website(url),
+            email=contacts.email,
+            phone=contacts.phone,
             website=normalize_website(url),
             source="website",
         )
@@ -1,13 +1,9 @@
 import csv
 import json
-import re
 from pathlib import Path
-from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 
-
-EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-PHONE_RE = re.compile(r"(\+?\d[\d\-\s\(\)]{7,}\d)")
+from .contacts import extract_contacts
+from .document import Document
 
 
 def normalize_website(url: str | None) -> str:
@@ -22,59 +18,48 @@ def normalize_website(url: str | None) -> str:
 
 
 def extract_emails(text: str) -> list[str]:
-    return sorted(set(m.lower() for m in EMAIL_RE.findall(text or "")))
+    return sorted(c.value for c in extract_contacts(text).emails)
 
 
 def extract_phones(text: str) -> list[str]:
-    found = []
-    for m in PHONE_RE.findall(text or ""):
-        digits = re.sub(r"\D", "", m)
-        if 10 <= len(digits) <= 15:
-            found.append("+" + digits if m.strip().startswith("+") else digits)
-    unique = []
-    for p in found:
-        if p not in unique:
-            unique.append(p)
-    return unique
+    return [c.value for c in sorted(extract_contacts(text).phones, key=lambda c: c.pos)]
 
 
 def extract_name_from_html(html: str, url: str = "") -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    for tag in ("h1", "h2"):
-        el = soup.find(tag)
-        if el and el.get_text(strip=True):
-            return el.get_text(strip=True)[:200]
-    if soup.title and soup.title.get_text(strip=True):
-        return soup.title.get_text(strip=True)[:200]
-    if url:
-        host = urlparse(url).netloc
-        return host.replace("www.", "")
-    return ""
+    return Document(html, url).name
 
 
 def ensure_parent_dir(path: str) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
 
-def write_csv(path: str, leads) -> None:
+CSV_FIELDS = ["name", "email", "phone", "website", "city", "source", "category", "created_at"]
+
+
+def write_csv_rows(path: str, chunks) -> None:
     ensure_parent_dir(path)
-    fieldnames = ["name", "email", "phone", "website", "city", "source", "category", "created_at"]
     with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for lead in leads:
-            writer.writerow(
-                {
-                    "name": lead.name,
-                    "email": lead.email or "",
-                    "phone": lead.phone or "",
-                    "website": lead.website or "",
-                    "city": lead.city or "",
-                    "source": lead.source or "",
-                    "category": lead.category or "",
-                    "created_at": lead.created_at.isoformat(),
-                }
-            )
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def write_csv(path: str, leads) -> None:
+    rows = (
+        (
+            lead.name,
+            lead.email or "",
+            lead.phone or "",
+            lead.website or "",
+            lead.city or "",
+            lead.source or "",
+            lead.category or "",
+            lead.created_at.isoformat(),
+        )
+        for lead in leads
+    )
+    write_csv_rows(path, [rows])
 
 
 def load_json(path: str) -> dict: